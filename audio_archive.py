@@ -0,0 +1,263 @@
+import bz2
+import gzip
+import hashlib
+import io
+import json
+import lzma
+import mmap
+import os
+import struct
+import tarfile
+import threading
+import zipfile
+import zlib
+from collections import namedtuple
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'evaluation_tool', 'archives')
+INDEX_VERSION = 1
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+_COMPRESSED_TARS = {'.tar.gz': gzip.open, '.tgz': gzip.open, '.tar.bz2': bz2.open, '.tbz2': bz2.open,
+                    '.tar.xz': lzma.open, '.txz': lzma.open}
+_READ_CHUNK = 1024 * 1024
+_ZIP_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+
+# stored members are sliced out of the mapped archive, zip members are inflated from their offset,
+# members of a compressed tar are read by seeking in the decompressed stream
+STORED, DEFLATED, BZIP2, ZIP_OTHER, TAR_STREAM = 'stored', 'deflated', 'bzip2', 'zip', 'tar'
+
+Member = namedtuple('Member', ['name', 'offset', 'size', 'compressed_size', 'method', 'valid'])
+MemberStat = namedtuple('MemberStat', ['st_size', 'st_mtime_ns'])
+
+
+def archive_suffix(path):
+    lower = path.lower()
+    return next((suffix for suffix in ARCHIVE_SUFFIXES if lower.endswith(suffix)), None)
+
+
+def folder_name(folder):
+    """name of an audio folder, or of an archive without its suffix: 'runs/batch1.tar.gz' -> 'batch1'
+    """
+    name = os.path.basename(os.path.normpath(folder))
+    suffix = archive_suffix(name)
+    return name[:-len(suffix)] if suffix and len(name) > len(suffix) else name
+
+
+def is_archive(path):
+    """whether path is a zip or (compressed) tar file that audio can be read from
+    """
+    return bool(path) and archive_suffix(path) is not None and os.path.isfile(path)
+
+
+class AudioArchive:
+    """wav members of a zip or tar file, read one at a time without extracting the archive
+
+    The member offsets are indexed once and cached by the archive's path, mtime and size, so later
+    opens only load the index. Members are addressed by their path in the archive, as
+    '<archive>/<folder>/<name>.wav', so equal file names in different folders are kept apart.
+    """
+    def __init__(self, path, cache_dir=DEFAULT_CACHE_DIR):
+        self.path = os.path.abspath(path)
+        stat = os.stat(self.path)
+        self.mtime_ns = stat.st_mtime_ns
+        self.suffix = archive_suffix(self.path)
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b''
+        self._lock = threading.Lock()
+        self._zip = None        # ZipFile for members of other compression methods, opened on first use
+        # every thread reads a compressed tar through its own decompressed stream, so a thread going
+        # through the clips in order only ever seeks forward
+        self._local = threading.local()
+        key = f"{self.path}|{stat.st_mtime_ns}|{stat.st_size}|{INDEX_VERSION}"
+        index_path = os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                members = [Member(*entry) for entry in json.load(f)]
+        except (OSError, ValueError, TypeError):
+            members = self._build_index()
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                temp_path = f"{index_path}.{os.getpid()}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(members, f)
+                os.replace(temp_path, index_path)
+            except OSError as e:
+                print(f"Caching the index of '{os.path.basename(self.path)}' failed: {e}")
+        # path in the archive -> Member, tar paths may start with './'
+        self.members = {member.name[2:] if member.name.startswith('./') else member.name: member
+                        for member in members}
+
+    def _build_index(self):
+        if self.suffix == '.zip':
+            return self._index_zip()
+        return self._index_tar()
+
+    def _index_zip(self):
+        members = []
+        with zipfile.ZipFile(self.path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.endswith('.wav'):
+                    continue
+                header = _ZIP_LOCAL_HEADER.unpack_from(self._map, info.header_offset)
+                offset = info.header_offset + _ZIP_LOCAL_HEADER.size + header[9] + header[10]
+                method = {zipfile.ZIP_STORED: STORED, zipfile.ZIP_DEFLATED: DEFLATED,
+                          zipfile.ZIP_BZIP2: BZIP2}.get(info.compress_type, ZIP_OTHER)
+                member = Member(info.filename, offset, info.file_size, info.compress_size,
+                                method, not info.flag_bits & 0x1)     # encrypted members cannot be read
+                if member.valid:
+                    member = member._replace(valid=_is_wav_header(self._read(member, 12)))
+                members.append(member)
+        return members
+
+    def _index_tar(self):
+        members = []
+        method = TAR_STREAM if self.suffix in _COMPRESSED_TARS else STORED
+        # the headers are read in one pass, a compressed tar is decompressed once for it
+        with tarfile.open(self.path, 'r:*') as archive:
+            for info in archive:
+                if info.isfile() and info.name.endswith('.wav'):
+                    header = archive.extractfile(info).read(12)
+                    members.append(Member(info.name, info.offset_data, info.size, info.size,
+                                          method, _is_wav_header(header)))
+        return members
+
+    def wav_paths(self, invalid=None):
+        """'<archive>/<name>' of every wav member, members with a bad header are appended to invalid if given
+        """
+        paths = [os.path.join(self.path, name) for name, member in self.members.items() if member.valid]
+        if invalid is not None:
+            invalid.extend(os.path.join(self.path, name) for name, member in self.members.items() if not member.valid)
+        return paths
+
+    def stat(self, name):
+        """size of the member and mtime of the archive, what caches key clips by
+        """
+        return MemberStat(self.members[name].size, self.mtime_ns)
+
+    def buffer(self, name):
+        """the member's bytes: a zero-copy view of the mapped archive for stored members, decompressed otherwise
+        """
+        member = self.members[name]
+        if member.method == STORED:
+            return memoryview(self._map)[member.offset:member.offset + member.size]
+        return self._read(member)
+
+    def _read(self, member, limit=None):
+        """decompress the member, or only its first limit bytes
+        """
+        size = member.size if limit is None else min(limit, member.size)
+        if member.method == STORED:
+            return bytes(self._map[member.offset:member.offset + size])
+        if member.method in (DEFLATED, BZIP2):
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if member.method == DEFLATED else bz2.BZ2Decompressor()
+            parts, produced = [], 0
+            end = member.offset + member.compressed_size
+            for start in range(member.offset, end, _READ_CHUNK):
+                part = decompressor.decompress(self._map[start:min(start + _READ_CHUNK, end)])
+                parts.append(part)
+                produced += len(part)
+                if produced >= size:
+                    break
+            return b''.join(parts)[:size]
+        if member.method == ZIP_OTHER:
+            with self._lock:
+                if self._zip is None:
+                    self._zip = zipfile.ZipFile(self.path)
+                with self._zip.open(member.name) as f:
+                    return f.read(size)
+        # seeking back restarts the decompression, so the thread's last member is kept for reading it again
+        last = getattr(self._local, 'last', None)
+        if last is not None and last[0] == member.name and len(last[1]) >= size:
+            return last[1][:size]
+        stream = getattr(self._local, 'stream', None)
+        if stream is None:
+            stream = self._local.stream = _COMPRESSED_TARS[self.suffix](self.path, 'rb')
+        stream.seek(member.offset)
+        data = stream.read(size)
+        self._local.last = (member.name, data)
+        return data
+
+
+def _is_wav_header(header):
+    return len(header) == 12 and header[:4] == b'RIFF' and header[8:] == b'WAVE'
+
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def open_archive(path):
+    """the AudioArchive of path, opened once per process
+    """
+    path = os.path.abspath(path)
+    with _archives_lock:
+        archive = _archives.get(path)
+        if archive is None:
+            archive = _archives[path] = AudioArchive(path)
+        return archive
+
+
+def archive_member(path):
+    """(AudioArchive, member name) for '<archive>/<name>' paths, None for plain files
+    """
+    directory, name = os.path.split(path)
+    while archive_suffix(directory) is None:
+        parent, folder = os.path.split(directory)
+        if not folder:
+            return None
+        directory, name = parent, f"{folder}/{name}"
+    if not os.path.isfile(directory):
+        return None
+    return open_archive(directory), name
+
+
+def split_sequential(paths):
+    """(members of compressed tars in archive order, all other paths)
+
+    A compressed tar is only fast to read front to back through one stream, so its members are
+    best read in that order on a single thread; the other paths can be spread over a pool.
+    """
+    sequential, other = [], []
+    for path in paths:
+        member = archive_member(path)
+        entry = member[0].members.get(member[1]) if member is not None else None
+        if entry is not None and entry.method == TAR_STREAM:
+            sequential.append((member[0].path, entry.offset, path))
+        else:
+            other.append(path)
+    return [path for _, _, path in sorted(sequential)], other
+
+
+def stat_audio(path):
+    """os.stat of a file, or the size and archive mtime of an archive member
+    """
+    member = archive_member(path)
+    if member is None:
+        return os.stat(path)
+    archive, name = member
+    try:
+        return archive.stat(name)
+    except KeyError:
+        raise FileNotFoundError(f"'{name}' is not in '{archive.path}'") from None
+
+
+def audio_buffer(path):
+    """the whole file as a buffer: the memory-mapped file, or the member of an archive
+    """
+    member = archive_member(path)
+    if member is None:
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    archive, name = member
+    try:
+        return archive.buffer(name)
+    except KeyError:
+        raise FileNotFoundError(f"'{name}' is not in '{archive.path}'") from None
+
+
+def audio_source(path):
+    """what wave.open reads path from: the path itself, or the archive member as a file object
+    """
+    if archive_member(path) is None:
+        return path
+    return io.BytesIO(audio_buffer(path))
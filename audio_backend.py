@@ -0,0 +1,95 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+class AudioBackend(ABC):
+    """audio output the GUI plays through, play_buffer returns a simpleaudio-like play object
+    (is_playing / stop / wait_done)
+    """
+    name = None
+
+    @abstractmethod
+    def play_buffer(self, audio_data, num_channels, bytes_per_sample, sample_rate):
+        pass
+
+    @abstractmethod
+    def stop_all(self):
+        pass
+
+
+class SimpleAudioBackend(AudioBackend):
+    """plays on the sound device through simpleaudio
+    """
+    name = 'simpleaudio'
+
+    def __init__(self):
+        import simpleaudio
+        self._sa = simpleaudio
+
+    def play_buffer(self, audio_data, num_channels, bytes_per_sample, sample_rate):
+        return self._sa.play_buffer(audio_data, num_channels, bytes_per_sample, sample_rate)
+
+    def stop_all(self):
+        self._sa.stop_all()
+
+
+class NullPlayObject:
+    """stands in for a buffer being played: busy for the buffer's duration, then done
+    """
+    def __init__(self, duration_s):
+        self.started_at = time.monotonic()
+        self.duration_s = duration_s
+        self._stopped = threading.Event()
+
+    def is_playing(self):
+        return not self._stopped.is_set() and time.monotonic() - self.started_at < self.duration_s
+
+    def stop(self):
+        self._stopped.set()
+
+    def wait_done(self):
+        remaining = self.started_at + self.duration_s - time.monotonic()
+        if remaining > 0:
+            self._stopped.wait(remaining)
+
+
+class NullAudioBackend(AudioBackend):
+    """no sound device needed: buffers are consumed in simulated real time and every call is recorded
+
+    With realtime=False buffers finish immediately, for running the annotation loop as fast as possible.
+    plays holds one dict per play_buffer call with its monotonic start time, size and duration.
+    """
+    name = 'null'
+
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self.plays = []
+        self.stops = []
+        self._active = []
+        self._lock = threading.Lock()
+
+    def play_buffer(self, audio_data, num_channels, bytes_per_sample, sample_rate):
+        num_bytes = memoryview(audio_data).nbytes
+        duration_s = num_bytes / (num_channels * bytes_per_sample * sample_rate)
+        play_obj = NullPlayObject(duration_s if self.realtime else 0)
+        with self._lock:
+            self.plays.append({'time': play_obj.started_at, 'bytes': num_bytes, 'duration_ms': duration_s * 1000})
+            self._active = [p for p in self._active if p.is_playing()] + [play_obj]
+        return play_obj
+
+    def stop_all(self):
+        with self._lock:
+            self.stops.append(time.monotonic())
+            for play_obj in self._active:
+                play_obj.stop()
+            self._active = []
+
+
+BACKENDS = {backend.name: backend for backend in (SimpleAudioBackend, NullAudioBackend)}
+
+
+def create_backend(name='simpleaudio'):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown audio backend '{name}', choose from {sorted(BACKENDS)}.")
+    return BACKENDS[name]()
@@ -0,0 +1,177 @@
+import threading
+import wave
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from audio_archive import audio_source
+from audio_stream import WavStream, is_long_recording
+
+
+class AudioClip(namedtuple('AudioClip', ['data', 'num_channels', 'bytes_per_sample', 'sample_rate', 'num_frames'])):
+    __slots__ = ()
+
+    @property
+    def frame_size(self):
+        return self.num_channels * self.bytes_per_sample
+
+    @property
+    def duration_ms(self):
+        return self.num_frames / self.sample_rate * 1000
+
+    def buffer_from(self, start_ms=0):
+        """zero-copy view of the PCM data from start_ms to the end, cut at a frame boundary
+        """
+        start_frame = min(max(int(start_ms * self.sample_rate / 1000), 0), self.num_frames)
+        return memoryview(self.data)[start_frame * self.frame_size:]
+
+
+def decode_wav(file_path):
+    """read the whole wav file (or archive member) into an AudioClip, the file handle is closed before returning
+    """
+    with wave.open(audio_source(file_path), 'rb') as audio_read:
+        num_frames = audio_read.getnframes()
+        return AudioClip(
+            data=audio_read.readframes(num_frames),
+            num_channels=audio_read.getnchannels(),
+            bytes_per_sample=audio_read.getsampwidth(),
+            sample_rate=audio_read.getframerate(),
+            num_frames=num_frames,
+        )
+
+
+class AudioCache:
+    """LRU cache of decoded clips, bounded by the total size of the PCM data
+
+    Files bigger than stream_bytes are opened as a memory-mapped WavStream and never cached.
+    Keys registered with add_source (e.g. clips of a work server) are fetched again on a miss.
+    """
+    def __init__(self, max_bytes=256 * 1024 * 1024, stream_bytes=None):
+        self.max_bytes = max_bytes
+        self.stream_bytes = stream_bytes
+        self.metrics = None     # optional instrumentation.Metrics, decodes are recorded as 'decode' spans
+        self.hits = 0
+        self.misses = 0
+        self._clips = OrderedDict()
+        self._size = 0
+        self._sources = {}      # key -> function returning its clip, for keys that are not files
+        self._lock = threading.Lock()
+
+    def __contains__(self, file_path):
+        with self._lock:
+            return file_path in self._clips
+
+    def get(self, file_path):
+        """return the cached clip (and mark it as recently used), or None
+        """
+        with self._lock:
+            clip = self._clips.get(file_path)
+            if clip is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._clips.move_to_end(file_path)
+            return clip
+
+    def put(self, file_path, clip):
+        """store a clip, evicting the least recently used ones to stay within max_bytes
+        """
+        size = len(clip.data)
+        if isinstance(clip, WavStream) or size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._clips.pop(file_path, None)
+            if old is not None:
+                self._size -= len(old.data)
+            while self._clips and self._size + size > self.max_bytes:
+                _, evicted = self._clips.popitem(last=False)
+                self._size -= len(evicted.data)
+            self._clips[file_path] = clip
+            self._size += size
+
+    def add_source(self, key, fetch):
+        """load key with fetch() instead of decoding a file, whenever it is not cached
+        """
+        with self._lock:
+            self._sources[key] = fetch
+
+    def open_clip(self, file_path):
+        """decode the file, or map it as a WavStream if it is a long recording
+        """
+        with self._lock:
+            fetch = self._sources.get(file_path)
+        if fetch is not None:
+            return fetch()
+        with self.metrics.span('decode') if self.metrics is not None else nullcontext():
+            if is_long_recording(file_path, self.stream_bytes):
+                return WavStream(file_path)
+            return decode_wav(file_path)
+
+    def load(self, file_path):
+        """return the clip from the cache, decoding it on the calling thread on a miss
+        """
+        clip = self.get(file_path)
+        if clip is None:
+            clip = self.open_clip(file_path)
+            self.put(file_path, clip)
+        return clip
+
+    def clear(self):
+        with self._lock:
+            self._clips.clear()
+            self._size = 0
+
+    def stats(self):
+        """hit/miss counters and current memory usage
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'clips': len(self._clips),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+            }
+
+
+class AudioPrefetcher:
+    """decode upcoming clips into an AudioCache on a worker thread
+    """
+    def __init__(self, cache, max_workers=1):
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='audio-prefetch')
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, file_paths):
+        """schedule file_paths for decoding, queued work for clips no longer wanted is dropped
+        """
+        wanted = [path for path in file_paths if path]
+        with self._lock:
+            for path, future in list(self._futures.items()):
+                if future.done() or (path not in wanted and future.cancel()):
+                    del self._futures[path]
+            for path in wanted:
+                if path not in self._futures and path not in self.cache:
+                    self._futures[path] = self._executor.submit(self._decode, path)
+
+    def _decode(self, file_path):
+        if not is_long_recording(file_path, self.cache.stream_bytes):
+            self.cache.put(file_path, self.cache.open_clip(file_path))
+
+    def get(self, file_path):
+        """return the clip for file_path, waiting for an in-flight prefetch instead of decoding twice
+        """
+        with self._lock:
+            future = self._futures.pop(file_path, None)
+        if future is not None and not future.cancel():
+            try:
+                future.result()
+            except (OSError, EOFError, wave.Error):
+                pass  # decode again below so the caller gets the error
+        return self.cache.load(file_path)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,107 @@
+"""NumPy helpers over decoded PCM clips (AudioClip / WavStream). numpy is imported lazily so that
+importing this module costs nothing at startup.
+"""
+
+
+def pcm_to_mono(clip, start_frame=0, end_frame=None):
+    """float32 samples in [-1, 1] of frames [start_frame, end_frame), channels averaged
+    """
+    import numpy as np
+    width, channels = clip.bytes_per_sample, clip.num_channels
+    end_frame = clip.num_frames if end_frame is None else min(end_frame, clip.num_frames)
+    start_frame = min(max(start_frame, 0), end_frame)
+    data = clip.data[start_frame * width * channels:end_frame * width * channels]
+    if width == 1:
+        samples = (np.frombuffer(data, np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(data, '<i2').astype(np.float32) / 2 ** 15
+    elif width == 3:
+        raw = np.frombuffer(data, np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = (np.where(ints & 0x800000, ints - 0x1000000, ints)).astype(np.float32) / 2 ** 23
+    elif width == 4:
+        samples = np.frombuffer(data, '<i4').astype(np.float32) / 2 ** 31
+    else:
+        raise ValueError(f"unsupported sample width: {width}")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def rms_envelope(samples, sample_rate, hop_ms=10):
+    """RMS of consecutive hop_ms windows
+    """
+    import numpy as np
+    hop = max(int(sample_rate * hop_ms / 1000), 1)
+    usable = len(samples) // hop * hop
+    if not usable:
+        return np.zeros(0, np.float32)
+    return np.sqrt(np.mean(samples[:usable].reshape(-1, hop) ** 2, axis=1))
+
+
+def estimate_offset_ms(clip, reference_clip, hop_ms=10, min_correlation=0.3):
+    """where the content of clip sits relative to reference_clip, by cross-correlating RMS envelopes
+
+    A positive offset means the same content comes offset ms later in clip than in the reference.
+    Returns None if the envelopes do not correlate well enough to trust the peak.
+    """
+    import numpy as np
+    a = rms_envelope(pcm_to_mono(clip), clip.sample_rate, hop_ms)
+    b = rms_envelope(pcm_to_mono(reference_clip), reference_clip.sample_rate, hop_ms)
+    if len(a) < 2 or len(b) < 2:
+        return None
+    a = a - a.mean()
+    b = b - b.mean()
+    norm = np.linalg.norm(a) * np.linalg.norm(b)
+    if norm == 0:
+        return None
+    size = len(a) + len(b) - 1
+    n_fft = 1 << (size - 1).bit_length()
+    correlation = np.fft.irfft(np.fft.rfft(a, n_fft) * np.conj(np.fft.rfft(b, n_fft)), n_fft)
+    # lags 0..len(a)-1 sit at the front, negative lags wrap around to the end
+    correlation = np.concatenate((correlation[n_fft - (len(b) - 1):], correlation[:len(a)])) / norm
+    peak = int(np.argmax(correlation))
+    if correlation[peak] < min_correlation:
+        return None
+    return (peak - (len(b) - 1)) * hop_ms
+
+
+def waveform_peaks(clip, columns=800, block_columns=64):
+    """(min, max) sample of each of `columns` equal slices of the clip, as two float32 arrays
+
+    The clip is converted block_columns slices at a time, so long recordings never become one big array.
+    """
+    import numpy as np
+    frames_per_column = max(-(-clip.num_frames // columns), 1)
+    lows, highs = np.zeros(columns, np.float32), np.zeros(columns, np.float32)
+    for first in range(0, columns, block_columns):
+        last = min(first + block_columns, columns)
+        samples = pcm_to_mono(clip, first * frames_per_column, last * frames_per_column)
+        if not len(samples):
+            break
+        count = -(-len(samples) // frames_per_column)
+        padded = np.zeros(count * frames_per_column, np.float32)
+        padded[:len(samples)] = samples
+        blocks = padded.reshape(count, frames_per_column)
+        lows[first:first + count] = blocks.min(axis=1)
+        highs[first:first + count] = blocks.max(axis=1)
+    return lows, highs
+
+
+def spectrogram_strip(clip, columns=800, n_fft=512, bands=64):
+    """uint8 image (bands x columns) of log-magnitude spectra, one FFT frame centred in each column
+
+    Only columns * n_fft samples are read whatever the clip length.
+    """
+    import numpy as np
+    centres = np.linspace(0, max(clip.num_frames - 1, 0), columns).astype(np.int64)
+    frames = np.zeros((columns, n_fft), np.float32)
+    for column, centre in enumerate(centres):
+        samples = pcm_to_mono(clip, centre - n_fft // 2, centre + n_fft // 2)
+        frames[column, :len(samples)] = samples
+    magnitude = np.abs(np.fft.rfft(frames * np.hanning(n_fft).astype(np.float32), axis=1))[:, 1:]
+    per_band = magnitude.shape[1] // bands
+    power = magnitude[:, :per_band * bands].reshape(columns, bands, per_band).mean(axis=2)
+    db = 20 * np.log10(power + 1e-6)
+    db = np.clip((db - (db.max() - 80)) / 80, 0, 1)     # 80 dB of dynamic range
+    return (db.T[::-1] * 255).astype(np.uint8)          # low frequencies at the bottom
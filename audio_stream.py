@@ -0,0 +1,135 @@
+import os
+import struct
+import threading
+import time
+import wave
+
+from audio_archive import audio_buffer, stat_audio
+
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavStream:
+    """PCM wav file that is memory-mapped instead of read, for recordings too long to decode up front
+
+    It has the same attributes as AudioClip, and data / buffer_from() are views of the mapped file,
+    so pages are only read from disk as playback reaches them. Stored members of an archive are
+    views of the mapped archive, compressed members are decompressed into memory.
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._map = audio_buffer(file_path)
+        if self._map[:4] != b'RIFF' or self._map[8:12] != b'WAVE':
+            raise wave.Error('file does not start with RIFF id')
+        fmt, data_offset, data_size = None, None, 0
+        position = 12
+        while position + 8 <= len(self._map):
+            chunk_id = self._map[position:position + 4]
+            chunk_size, = struct.unpack_from('<I', self._map, position + 4)
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack_from('<HHIIHH', self._map, position + 8)
+            elif chunk_id == b'data':
+                data_offset = position + 8
+                # streamed recordings may leave the size unset, the data runs to the end of the file then
+                data_size = min(chunk_size, len(self._map) - data_offset)
+                break
+            position += 8 + chunk_size + (chunk_size & 1)
+        if fmt is None or data_offset is None:
+            raise wave.Error('fmt chunk and/or data chunk missing')
+        audio_format, self.num_channels, self.sample_rate, _, block_align, bits = fmt
+        if audio_format not in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE):
+            raise wave.Error(f'unknown format: {audio_format}')
+        self.bytes_per_sample = (bits + 7) // 8
+        self.num_frames = data_size // block_align
+        self.data = memoryview(self._map)[data_offset:data_offset + self.num_frames * block_align]
+
+    @property
+    def frame_size(self):
+        return self.num_channels * self.bytes_per_sample
+
+    @property
+    def duration_ms(self):
+        return self.num_frames / self.sample_rate * 1000
+
+    def start_frame(self, start_ms):
+        return min(max(int(start_ms * self.sample_rate / 1000), 0), self.num_frames)
+
+    def buffer_from(self, start_ms=0):
+        """zero-copy view of the mapped PCM data from start_ms to the end, cut at a frame boundary
+        """
+        return self.data[self.start_frame(start_ms) * self.frame_size:]
+
+    def chunks(self, start_ms=0, chunk_ms=5000):
+        """yield frame-aligned views of chunk_ms of audio each, from start_ms to the end
+        """
+        chunk_bytes = max(int(chunk_ms * self.sample_rate / 1000), 1) * self.frame_size
+        for offset in range(self.start_frame(start_ms) * self.frame_size, len(self.data), chunk_bytes):
+            yield self.data[offset:offset + chunk_bytes]
+
+
+def is_long_recording(file_path, stream_bytes):
+    """whether a file is big enough to be played as a WavStream rather than decoded
+    """
+    try:
+        return stream_bytes is not None and stat_audio(file_path).st_size > stream_bytes
+    except OSError:
+        return False
+
+
+class StreamPlayer:
+    """play a WavStream chunk after chunk from a feeder thread, looks like a simpleaudio play object
+
+    play_buffer is sa.play_buffer (or anything with its signature), which cannot queue a buffer behind
+    a playing one. Each chunk is therefore started on the timeline of the first one, lead_ms before the
+    previous chunk ends to cover the device's start-up, rather than after it drained: no gap at chunk
+    boundaries and no drift against the playback clock. At most two chunks are in memory.
+    """
+    def __init__(self, stream, play_buffer, start_ms=0, chunk_ms=5000, lead_ms=20):
+        self.stream = stream
+        self.play_buffer = play_buffer
+        self.start_ms = start_ms
+        self.chunk_ms = chunk_ms
+        self.lead_s = lead_ms / 1000
+        self._play_objs = []    # the chunk playing and the one starting under its tail
+        self._lock = threading.Lock()     # so stop() cannot slip in between the check and the next chunk
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._feed, name='stream-player', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _feed(self):
+        stream = self.stream
+        started_at, queued_frames = None, 0
+        for chunk in stream.chunks(self.start_ms, self.chunk_ms):
+            if self._play_objs and self._play_objs[-1].is_playing():
+                # the previous chunk ends queued_frames after the first one started
+                ends_at = started_at + queued_frames / stream.sample_rate
+                if self._stopped.wait(max(ends_at - self.lead_s - time.monotonic(), 0)):
+                    break
+            with self._lock:
+                if self._stopped.is_set():
+                    break
+                play_obj = self.play_buffer(chunk, stream.num_channels, stream.bytes_per_sample, stream.sample_rate)
+                self._play_objs = self._play_objs[-1:] + [play_obj]
+            if started_at is None:
+                started_at = time.monotonic()
+            queued_frames += len(chunk) // stream.frame_size
+        for play_obj in list(self._play_objs):
+            play_obj.wait_done()
+        self._stopped.set()
+
+    def is_playing(self):
+        return not self._stopped.is_set()
+
+    def stop(self):
+        with self._lock:
+            self._stopped.set()
+            for play_obj in self._play_objs:
+                play_obj.stop()
+
+    def wait_done(self):
+        self._thread.join()
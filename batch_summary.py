@@ -0,0 +1,117 @@
+"""Headless summary of many evaluation runs, without PyQt5.
+
+    python batch_summary.py --result_folder runs/ --process_num 8
+"""
+import csv
+import os
+import re
+import sys
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+from results_journal import ResultsJournal, VERDICTS, parse_results_txt
+from result_stats import ResultStats, compute_metrics
+
+
+# when a run has several result files, the journal is the most complete one
+SOURCE_PRIORITY = ('.jsonl', '.parquet', '.arrow', '.txt', '.xlsx')
+_RESULT_FILE = re.compile(r'^results_(.+)(\.jsonl|\.parquet|\.arrow|\.txt|\.xlsx)$')
+_SHARD_RUN = re.compile(r'^(.+)_shard\d+of\d+$')
+
+
+def find_result_files(result_folder):
+    """run name -> best result file for every results_<run>.jsonl/.txt/.xlsx in result_folder
+
+    The shard runs of a folder are left out once results_<folder>_merged is there, it holds their verdicts.
+    """
+    found = {}
+    with os.scandir(result_folder) as entries:
+        for entry in entries:
+            match = _RESULT_FILE.match(entry.name)
+            if match and entry.is_file():
+                found.setdefault(match.group(1), {})[match.group(2)] = entry.path
+    for run in list(found):
+        shard = _SHARD_RUN.match(run)
+        if shard and f"{shard.group(1)}_merged" in found:
+            del found[run]
+    return {run: next(paths[ext] for ext in SOURCE_PRIORITY if ext in paths)
+            for run, paths in sorted(found.items())}
+
+
+def read_records(result_file):
+    if result_file.endswith('.jsonl'):
+        return iter(ResultsJournal(result_file))
+    if result_file.endswith('.txt'):
+        return parse_results_txt(result_file)
+    if result_file.endswith(('.parquet', '.arrow')):
+        from results_columnar import read_columnar
+        return read_columnar([result_file], ['file', 'result']).to_pylist()
+    import pandas as pd
+    df = pd.read_excel(result_file, sheet_name='Results', usecols=['file', 'result'], dtype=str)
+    return df.dropna().to_dict('records')
+
+
+def summarize_run(run, result_file):
+    """verdict counts of one run, only the latest verdict of each file counts
+    """
+    stats = ResultStats()
+    for record in read_records(result_file):
+        if record.get('result') in VERDICTS:
+            stats.add(record)
+    return run, result_file, {verdict: stats.counts[verdict] for verdict in VERDICTS}
+
+
+def summary_row(run, source, counts):
+    metrics = compute_metrics(counts)
+    row = {'run': run, 'source': source, 'files': sum(counts.values())}
+    row.update(counts)
+    for name, value in metrics.items():
+        if name.endswith('_CI95'):
+            row[f'{name}_low'], row[f'{name}_high'] = value
+        else:
+            row[name] = value
+    return row
+
+
+def batch_summary(result_folder, process_num=1):
+    """one summary row per run plus an 'ALL' row over every run
+    """
+    result_files = find_result_files(result_folder)
+    if process_num > 1 and len(result_files) > 1:
+        with ProcessPoolExecutor(max_workers=process_num) as executor:
+            summaries = list(executor.map(summarize_run, result_files.keys(), result_files.values()))
+    else:
+        summaries = [summarize_run(run, path) for run, path in result_files.items()]
+
+    rows = [summary_row(run, os.path.basename(path), counts) for run, path, counts in summaries]
+    total = {verdict: sum(counts[verdict] for _, _, counts in summaries) for verdict in VERDICTS}
+    rows.append(summary_row('ALL', '', total))
+    return rows
+
+
+def write_table(rows, output):
+    with open(output, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter, description=__doc__.splitlines()[0])
+    parser.add_argument('--result_folder', type=str, required=True)
+    parser.add_argument('--process_num', type=int, default=1)
+    parser.add_argument('--output', type=str, default=None, help='defaults to <result_folder>/summary_all.csv')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.result_folder):
+        print(f"Result folder '{args.result_folder}' not found.")
+        return 1
+    rows = batch_summary(args.result_folder, args.process_num)
+    output = args.output or os.path.join(args.result_folder, 'summary_all.csv')
+    write_table(rows, output)
+    print(f"{len(rows) - 1} runs summarized into '{output}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Generate a synthetic evaluation corpus: audio folder, reference folder and text scripts.
+
+    python benchmarks/generate_corpus.py --output corpus_1k --num_clips 1000
+"""
+import math
+import os
+import random
+import struct
+import wave
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+
+
+WORDS = ['da', 'deng', 'dada', 'la', 'ka', 'mo', 'ni', 'hao', 'test', 'audio', 'speech', 'voice']
+
+
+def tone(num_frames, sample_rate, frequency, num_channels=1):
+    """16-bit PCM sine tone with a little noise, packed as bytes
+    """
+    rng = random.Random(frequency)
+    samples = [int(8000 * math.sin(2 * math.pi * frequency * i / sample_rate)) + rng.randint(-300, 300)
+               for i in range(num_frames)]
+    frames = struct.pack(f'<{num_frames}h', *samples)
+    if num_channels > 1:
+        frames = b''.join(frames[i:i + 2] * num_channels for i in range(0, len(frames), 2))
+    return frames
+
+
+def write_wav(path, frames, num_channels, sample_rate):
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(num_channels)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(frames)
+
+
+def generate_corpus(output, num_clips, min_seconds=0.2, max_seconds=2.0, sample_rate=8000, num_channels=1,
+                    reference=True, lengths=8, seed=0):
+    """write num_clips wavs of varying length plus both script formats, returns the paths
+
+    Only `lengths` distinct tones are synthesized and reused, so even 100k clips are written quickly.
+    """
+    rng = random.Random(seed)
+    audio_folder = os.path.join(output, 'audio_folder')
+    reference_folder = os.path.join(output, 'reference_audio_folder')
+    os.makedirs(audio_folder, exist_ok=True)
+    if reference:
+        os.makedirs(reference_folder, exist_ok=True)
+    durations = [min_seconds + (max_seconds - min_seconds) * i / max(lengths - 1, 1) for i in range(lengths)]
+    tones = [tone(int(d * sample_rate), sample_rate, 220 + 40 * i, num_channels) for i, d in enumerate(durations)]
+
+    blocks_path = os.path.join(output, 'text_blocks.txt')    # '.wav' header + text lines
+    lines_path = os.path.join(output, 'text_lines.txt')      # one line per clip
+    width = len(str(num_clips))
+    with open(blocks_path, 'w', encoding='utf-8') as blocks, open(lines_path, 'w', encoding='utf-8') as lines:
+        for i in range(num_clips):
+            name = f"o{i:0{width}d}_spk{i % 10}.wav"
+            frames = tones[rng.randrange(lengths)]
+            write_wav(os.path.join(audio_folder, name), frames, num_channels, sample_rate)
+            if reference:
+                write_wav(os.path.join(reference_folder, name), frames, num_channels, sample_rate)
+            text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+            blocks.write(f"{name}\n{text}\n" + ("second line\n" if i % 3 == 0 else "") + "\n")
+            lines.write(text + '\n')
+    return {
+        'audio_folder': audio_folder,
+        'reference_audio_folder': reference_folder if reference else None,
+        'text_blocks': blocks_path,
+        'text_lines': lines_path,
+    }
+
+
+def main(argv=None):
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter, description=__doc__.splitlines()[0])
+    parser.add_argument('--output', type=str, required=True)
+    parser.add_argument('--num_clips', type=int, default=1000)
+    parser.add_argument('--min_seconds', type=float, default=0.2)
+    parser.add_argument('--max_seconds', type=float, default=2.0)
+    parser.add_argument('--sample_rate', type=int, default=8000)
+    parser.add_argument('--no_reference', action='store_true')
+    args = parser.parse_args(argv)
+    paths = generate_corpus(args.output, args.num_clips, args.min_seconds, args.max_seconds,
+                            args.sample_rate, reference=not args.no_reference)
+    print(paths)
+
+
+if __name__ == "__main__":
+    main()
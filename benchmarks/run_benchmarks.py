@@ -0,0 +1,235 @@
+"""Time the annotation loop on synthetic corpora, offscreen and without a sound device.
+
+    python benchmarks/run_benchmarks.py --sizes 1000,10000 --output bench.json
+
+Every size gets a generated corpus (kept in --corpus_dir for later runs), and the GUI is driven
+through its own methods with the null audio backend. The JSON output can be compared across versions.
+"""
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, Namespace
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_corpus import generate_corpus  # noqa: E402
+
+
+# time from interpreter start to the window being shown, without loading a corpus
+STARTUP_TARGET_MS = 500
+
+COLD_START_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {repo!r})
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv[:1])
+import pyqt_evaluation_tool as tool
+from audio_backend import NullAudioBackend
+imported = time.perf_counter()
+window = tool.PyqtEvaluationTool(audio_backend=NullAudioBackend(realtime=False))
+window.show()
+app.processEvents()
+print(imported - start, time.perf_counter() - start)
+"""
+
+
+def summarize(samples_s):
+    """milliseconds statistics of a list of durations in seconds
+    """
+    samples = sorted(s * 1000 for s in samples_s)
+    if not samples:
+        return {'n': 0}
+    return {
+        'n': len(samples),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p95_ms': round(samples[min(int(len(samples) * 0.95), len(samples) - 1)], 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def wait_for(app, predicate, timeout=600):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError('corpus did not finish loading')
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def cold_start(runs=3, top=10):
+    """window-shown time of fresh interpreters, and the slowest top-level imports from -X importtime
+    """
+    script = COLD_START_SCRIPT.format(repo=REPO_ROOT)
+    imports_s, shown_s, import_times = [], [], {}
+    for _ in range(runs):
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', script],
+                                 capture_output=True, text=True, check=True)
+        imported, shown = (float(value) for value in process.stdout.split()[-2:])
+        imports_s.append(imported)
+        shown_s.append(shown)
+        for line in process.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package", nested imports are indented
+            if line.startswith('import time:') and '|' in line:
+                _, cumulative, name = line.split('|')
+                if cumulative.strip().isdigit() and not name.startswith('  '):
+                    import_times[name.strip()] = max(import_times.get(name.strip(), 0), int(cumulative))
+    window_shown = summarize(shown_s)
+    return {
+        'imports': summarize(imports_s),
+        'window_shown': window_shown,
+        'target_ms': STARTUP_TARGET_MS,
+        'meets_target': window_shown['p50_ms'] <= STARTUP_TARGET_MS,
+        'slowest_imports_ms': {name: round(us / 1000, 3) for name, us in
+                               sorted(import_times.items(), key=lambda item: -item[1])[:top]},
+    }
+
+
+def bench_corpus(app, corpus, text_file, samples, save_sizes, seed=0):
+    """startup, navigation, text lookup, verdict, save and summary timings for one corpus and script
+    """
+    import pyqt_evaluation_tool as tool
+    from audio_backend import NullAudioBackend
+
+    rng = random.Random(seed)
+    workdir = tempfile.mkdtemp(prefix='bench_')     # result files are written to the working directory
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    tool.args = Namespace(audio_folder=corpus['audio_folder'])
+    try:
+        backend = NullAudioBackend(realtime=False)
+        start = time.perf_counter()
+        # no autosave, so each save size below is written as one batch; the thumbnail and content
+        # caches start empty in the workdir, so runs neither touch ~/.cache nor inherit each other's verdicts
+        window = tool.PyqtEvaluationTool(audio_backend=backend, autosave_every=10 ** 9, autosave_s=10 ** 6,
+                                         thumbnail_dir=os.path.join(workdir, 'thumbnails'),
+                                         content_index_path=os.path.join(workdir, 'content_index.jsonl'))
+        window.load_files(corpus['audio_folder'], text_file, corpus['reference_audio_folder'])
+        wait_for(app, lambda: window.manifest is not None and backend.plays)    # first clip playing
+        startup = time.perf_counter() - start
+        num_clips = len(window.audio_files)
+
+        rows = [rng.randrange(num_clips) for _ in range(samples)]
+        navigation = [timed(window.on_item_clicked, window.file_model.index(row)) for row in rows]
+        next_audio = []
+        for row in rows:
+            window.current_index = min(row, num_clips - 2)
+            next_audio.append(timed(window.next_audio))
+        text_lookup = []
+        for row in rows:
+            window.current_index = row
+            text_lookup.append(timed(window.get_text_ultimate))
+        reference = []
+        for row in rows[:max(samples // 10, 1)]:
+            window.current_index = row
+            reference.append(timed(window.play_reference_audio_button_clicked))
+
+        # verdicts wrap around the corpus until each save size is reached
+        verdicts, saves = [], {}
+        for size in save_sizes:
+            for i in range(size):
+                window.current_index = i % (num_clips - 1)
+                window.note.setPlainText('wrong\nnote' if i % 5 == 0 else '')
+                verdicts.append(timed(window.mark_result, rng.choice(['TP', 'TN', 'FP', 'FN', 'T', 'F'])))
+            # the GUI only queues the save, the flush is the writer thread making it durable
+            saves[str(size)] = {'queue_ms': round(timed(window.save_progress) * 1000, 3),
+                                'flush_ms': round(timed(window.results_writer.flush) * 1000, 3)}
+        summary = timed(window.save_and_summary)
+        summary_flush = timed(window.results_writer.flush)
+        cache = window.audio_cache.stats()
+        spans = window.metrics.snapshot()
+        window.close()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'clips': num_clips,
+        'startup_ms': round(startup * 1000, 3),
+        'navigate_click': summarize(navigation),
+        'next_audio': summarize(next_audio),
+        'text_lookup': summarize(text_lookup),
+        'reference_play': summarize(reference),
+        'mark_result': summarize(verdicts),
+        'save_progress_ms': saves,
+        'save_and_summary_ms': round(summary * 1000, 3),
+        'summary_export_ms': round(summary_flush * 1000, 3),
+        'audio_cache': cache,
+        'spans': spans,
+    }
+
+
+def main(argv=None):
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter, description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=str, default='1000', help='comma separated corpus sizes, e.g. 1000,10000,100000')
+    parser.add_argument('--corpus_dir', type=str, default=os.path.join(tempfile.gettempdir(), 'evaluation_tool_corpora'))
+    parser.add_argument('--samples', type=int, default=200, help='navigation / lookup samples per corpus')
+    parser.add_argument('--save_sizes', type=str, default='100,1000', help='result-set sizes timed for saving')
+    parser.add_argument('--output', type=str, default=None, help='JSON file, printed to stdout if not given')
+    args = parser.parse_args(argv)
+
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    save_sizes = [int(size) for size in args.save_sizes.split(',')]
+    report = {
+        'version': version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'cold_start': cold_start(),
+        'results': {},
+    }
+    for size in (int(size) for size in args.sizes.split(',')):
+        corpus_root = os.path.join(args.corpus_dir, f'corpus_{size}')
+        start = time.perf_counter()
+        if os.path.isdir(corpus_root):
+            corpus = {
+                'audio_folder': os.path.join(corpus_root, 'audio_folder'),
+                'reference_audio_folder': os.path.join(corpus_root, 'reference_audio_folder'),
+                'text_blocks': os.path.join(corpus_root, 'text_blocks.txt'),
+                'text_lines': os.path.join(corpus_root, 'text_lines.txt'),
+            }
+        else:
+            corpus = generate_corpus(corpus_root, size)
+        report['results'][str(size)] = {
+            'generate_s': round(time.perf_counter() - start, 3),
+            'text_blocks': bench_corpus(app, corpus, corpus['text_blocks'], args.samples, save_sizes),
+            'text_lines': bench_corpus(app, corpus, corpus['text_lines'], args.samples, save_sizes),
+        }
+        print(f"corpus {size}: done", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
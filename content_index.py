@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_archive import split_sequential, stat_audio
+from audio_stream import WavStream
+from results_journal import RESULT_COLUMNS, VERDICTS
+
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'evaluation_tool', 'content_index.jsonl')
+_HASH_CHUNK = 16 * 1024 * 1024
+
+
+def pcm_digest(path):
+    """'<algorithm>:<hex>' digest of the PCM data and its format, the wav header and other chunks are ignored
+
+    xxh3_128 when the xxhash package is installed, BLAKE2b otherwise.
+    """
+    try:
+        import xxhash
+        algorithm, digest = 'xxh3_128', xxhash.xxh3_128()
+    except ImportError:
+        algorithm, digest = 'blake2b', hashlib.blake2b(digest_size=16)
+    stream = WavStream(path)
+    digest.update(f"{stream.num_channels},{stream.bytes_per_sample},{stream.sample_rate};".encode())
+    for offset in range(0, len(stream.data), _HASH_CHUNK):
+        digest.update(stream.data[offset:offset + _HASH_CHUNK])
+    return f"{algorithm}:{digest.hexdigest()}"
+
+
+class ContentIndex:
+    """audio content seen across folders and sessions: file -> PCM digest, and digest -> latest verdict
+
+    File digests are cached by size and mtime. Everything is kept in one append-only JSON lines file,
+    so the same clip in a regenerated batch or an overlapping test set inherits the earlier verdict.
+    """
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.files = {}         # absolute path -> (size, mtime_ns, digest)
+        self.verdicts = {}      # digest -> latest verdict record, with the absolute path it was given to
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue    # torn write after a crash
+                    if entry.get('type') == 'file':
+                        self.files[entry['path']] = (entry['size'], entry['mtime_ns'], entry['digest'])
+                    elif entry.get('type') == 'verdict':
+                        self.verdicts[entry['digest']] = entry
+
+    def _append(self, entries):
+        if not entries:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+
+    def digest_of(self, path):
+        """cached digest of path, None if it was never hashed or changed since
+        """
+        try:
+            stat = stat_audio(path)
+        except OSError:
+            return None
+        cached = self.files.get(os.path.abspath(path))
+        if cached is None or cached[:2] != (stat.st_size, stat.st_mtime_ns):
+            return None
+        return cached[2]
+
+    def update(self, paths, max_workers=8):
+        """hash every path without a cached digest on a thread pool, returns {path: digest} of all paths
+
+        Members of a compressed tar are hashed in one pass on the calling thread, as every pool thread
+        would decompress the archive again. Paths that cannot be read are left out.
+        """
+        sequential, missing = split_sequential([path for path in paths if self.digest_of(path) is None])
+
+        def hash_file(path):
+            try:
+                stat = stat_audio(path)
+                return path, stat, pcm_digest(path)
+            except (OSError, ValueError, wave.Error) as e:
+                print(f"Hashing '{os.path.basename(path)}' failed: {e}")
+                return path, None, None
+
+        hashed = [hash_file(path) for path in sequential]
+        if missing:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                hashed.extend(executor.map(hash_file, missing))
+        entries = []
+        with self._lock:
+            for path, stat, digest in hashed:
+                if digest is not None:
+                    self.files[os.path.abspath(path)] = (stat.st_size, stat.st_mtime_ns, digest)
+                    entries.append({'type': 'file', 'path': os.path.abspath(path), 'size': stat.st_size,
+                                    'mtime_ns': stat.st_mtime_ns, 'digest': digest})
+            self._append(entries)
+        digests = {path: self.digest_of(path) for path in paths}
+        return {path: digest for path, digest in digests.items() if digest is not None}
+
+    def record(self, audio_files, records):
+        """remember the verdicts of records under their content digests, records name their file in audio_files
+        """
+        by_name = {os.path.basename(path): path for path in audio_files}
+        paths = {record['file']: by_name[record['file']] for record in records
+                 if record.get('result') in VERDICTS and record['file'] in by_name}
+        digests = self.update(list(paths.values()))
+        entries = []
+        with self._lock:
+            for record in records:
+                digest = digests.get(paths.get(record['file']))
+                if digest is not None:
+                    entry = {'type': 'verdict', 'digest': digest, 'path': os.path.abspath(paths[record['file']])}
+                    entry.update({column: record.get(column, '') for column in RESULT_COLUMNS})
+                    self.verdicts[digest] = entry
+                    entries.append(entry)
+            self._append(entries)
+
+    def inherited(self, digests, own_verdicts=()):
+        """{file name: record} for files whose content already got a verdict as another file
+
+        digests is update()'s {path: digest}; files with a verdict of their own (own_verdicts) are skipped.
+        The records carry the verdict, and 'inherited_from' the path that was rated.
+        """
+        inherited = {}
+        for path, digest in digests.items():
+            filename = os.path.basename(path)
+            entry = self.verdicts.get(digest)
+            if entry is None or filename in own_verdicts or entry['path'] == os.path.abspath(path):
+                continue
+            record = {column: entry.get(column, '') for column in RESULT_COLUMNS}
+            record['file'] = filename
+            record['inherited_from'] = entry['path']
+            inherited[filename] = record
+        return inherited
@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Metrics:
+    """timing spans by name, each kept in a ring buffer of the latest `capacity` samples
+
+    Counts and sums cover the whole session, quantiles the samples still in the ring buffer.
+    Safe to record from worker threads.
+    """
+    def __init__(self, capacity=2048):
+        self.capacity = capacity
+        self.started_at = time.time()
+        self._samples = {}
+        self._counts = {}
+        self._sums = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.capacity)
+                self._counts[name] = 0
+                self._sums[name] = 0.0
+            self._samples[name].append(seconds)
+            self._counts[name] += 1
+            self._sums[name] += seconds
+
+    def snapshot(self):
+        """{span: {count, sum_s, p50_ms, p90_ms, p99_ms, max_ms}}
+        """
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            counts, sums = dict(self._counts), dict(self._sums)
+        snapshot = {}
+        for name, values in sorted(samples.items()):
+            entry = {'count': counts[name], 'sum_s': round(sums[name], 6)}
+            for q in QUANTILES:
+                entry[f'p{int(q * 100)}_ms'] = round(values[min(int(len(values) * q), len(values) - 1)] * 1000, 3)
+            entry['max_ms'] = round(values[-1] * 1000, 3)
+            snapshot[name] = entry
+        return snapshot
+
+    def to_json(self):
+        return json.dumps({'session_start': self.started_at, 'spans': self.snapshot()}, indent=2)
+
+    def to_prometheus(self, prefix='evaluation_tool'):
+        """Prometheus text exposition format, one summary metric labelled by span
+        """
+        metric = f'{prefix}_span_seconds'
+        lines = [f'# HELP {metric} Duration of instrumented spans.', f'# TYPE {metric} summary']
+        for name, entry in self.snapshot().items():
+            for q in QUANTILES:
+                lines.append(f'{metric}{{span="{name}",quantile="{q}"}} {entry[f"p{int(q * 100)}_ms"] / 1000:.6g}')
+            lines.append(f'{metric}_sum{{span="{name}"}} {entry["sum_s"]}')
+            lines.append(f'{metric}_count{{span="{name}"}} {entry["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """write the metrics to path, Prometheus text for '.prom' files and JSON otherwise
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus() if path.endswith('.prom') else self.to_json())
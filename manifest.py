@@ -0,0 +1,170 @@
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_archive import is_archive, open_archive
+
+
+def file_stem(filename):
+    """'dir/abc_001.wav' -> 'abc_001'
+    """
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def natural_key(text):
+    """sort key that orders '2' before '10'
+    """
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', text)]
+
+
+def parse_shard(text):
+    """'i/N' -> (i, N) with 1 <= i <= N
+    """
+    index, _, count = text.partition('/')
+    index, count = int(index), int(count)
+    if not 1 <= index <= count:
+        raise ValueError(f"shard must be i/N with 1 <= i <= N, got '{text}'")
+    return index, count
+
+
+def shard_of(stem, count):
+    """1-based shard of a file stem among count shards, the same on every machine and run
+    """
+    return zlib.crc32(stem.encode('utf-8')) % count + 1
+
+
+def is_wav_file(path):
+    """check the RIFF/WAVE header without parsing the rest of the file
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(12)
+    except OSError:
+        return False
+    return len(header) == 12 and header[:4] == b'RIFF' and header[8:] == b'WAVE'
+
+
+def list_wav_files(folder, max_workers=8, invalid=None, duplicates=None):
+    """stem -> path of every valid .wav file in folder, empty if folder is missing
+
+    The folder is listed with os.scandir and the headers are checked on a thread pool,
+    paths with a bad header are appended to invalid if given. A zip or tar file is listed from
+    its cached member index instead, as '<archive>/<folder>/<name>.wav' paths; members whose stem
+    is already taken by a member in another folder are appended to duplicates if given.
+    """
+    if is_archive(folder):
+        by_stem = {}
+        for path in open_archive(folder).wav_paths(invalid):
+            if by_stem.setdefault(file_stem(path), path) != path and duplicates is not None:
+                duplicates.append(path)
+        return by_stem
+    if not folder or not os.path.isdir(folder):
+        return {}
+    with os.scandir(folder) as entries:
+        paths = [entry.path for entry in entries if entry.name.endswith('.wav') and entry.is_file()]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        valid = list(executor.map(is_wav_file, paths, chunksize=256))
+    if invalid is not None:
+        invalid.extend(path for path, ok in zip(paths, valid) if not ok)
+    return {file_stem(path): path for path, ok in zip(paths, valid) if ok}
+
+
+class Manifest:
+    """audio files joined with their text and reference audio by file stem
+
+    Audio files are ordered by natural sort of their stems. Texts of the '.wav'-header format are
+    joined by name; texts of the one-per-line format have no names and pair with that order.
+    With shard=(i, N) only the stems of shard i are kept, pairing by order still uses the whole folder.
+    """
+    def __init__(self, audio_folder, text_index=None, reference_audio_folder=None, max_workers=8, shard=None):
+        self.invalid_files = []
+        self.duplicate_files = []   # archive members left out because another folder has the same stem
+        self.audio_by_stem = list_wav_files(audio_folder, max_workers, self.invalid_files, self.duplicate_files)
+        self.reference_by_stem = list_wav_files(reference_audio_folder, max_workers, self.invalid_files,
+                                                self.duplicate_files)
+        self.stems = sorted(self.audio_by_stem, key=natural_key)
+        self.position = {stem: index for index, stem in enumerate(self.stems)}
+        self.audio_files = [self.audio_by_stem[stem] for stem in self.stems]
+        # aligned with audio_files, None where an audio file has no reference
+        self.reference_files = [self.reference_by_stem.get(stem) for stem in self.stems]
+        # folders that share no names at all are paired by their sorted order instead
+        self.reference_paired_by_order = bool(self.reference_by_stem) and not any(self.reference_files)
+        if self.reference_paired_by_order:
+            references = sorted(self.reference_by_stem, key=natural_key)
+            self.reference_files = [self.reference_by_stem[stem] for stem in references[:len(self.stems)]]
+            self.reference_files += [None] * (len(self.stems) - len(self.reference_files))
+        # position of each kept stem in the whole folder, what texts paired by order are looked up by
+        self.corpus_positions = list(range(len(self.stems)))
+        self.corpus_count = len(self.stems)
+        self.shard = shard
+        if shard is not None:
+            kept = [i for i, stem in enumerate(self.stems) if self.in_shard(stem)]
+            self.stems = [self.stems[i] for i in kept]
+            self.audio_files = [self.audio_files[i] for i in kept]
+            self.reference_files = [self.reference_files[i] for i in kept]
+            self.corpus_positions = kept
+            self.position = {stem: index for index, stem in enumerate(self.stems)}
+
+        self.has_reference_folder = bool(reference_audio_folder) and (
+            os.path.isdir(reference_audio_folder) or is_archive(reference_audio_folder))
+        self.text_stems = None
+        self.text_count = 0
+        self.text_paired_by_order = True
+        if text_index is not None:
+            self.text_count = len(text_index)
+            if text_index.block_names:
+                self.text_stems = {file_stem(name) for name in text_index.block_names}
+                self.text_paired_by_order = self.text_stems.isdisjoint(self.position)
+
+    def __len__(self):
+        return len(self.stems)
+
+    def in_shard(self, stem):
+        return self.shard is None or shard_of(stem, self.shard[1]) == self.shard[0]
+
+    def text_position(self, index):
+        """where the text of the clip at index sits when texts are paired by order
+        """
+        return self.corpus_positions[index]
+
+    def index_of(self, filename):
+        """position of an audio file (by name or path) in the manifest, or None
+        """
+        return self.position.get(file_stem(filename))
+
+    def unmatched(self):
+        """stems that could not be paired, by kind
+        """
+        unmatched = {'invalid_wav_header': [os.path.basename(path) for path in self.invalid_files],
+                     'duplicate_name': [os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+                                        for path in self.duplicate_files]}
+        if not self.text_paired_by_order:
+            unmatched['audio_without_text'] = [s for s in self.stems if s not in self.text_stems]
+            unmatched['text_without_audio'] = sorted((s for s in self.text_stems.difference(self.audio_by_stem)
+                                                      if self.in_shard(s)), key=natural_key)
+        if self.has_reference_folder and not self.reference_paired_by_order:
+            unmatched['audio_without_reference'] = [s for s, r in zip(self.stems, self.reference_files) if r is None]
+            unmatched['reference_without_audio'] = sorted((s for s in set(self.reference_by_stem).difference(self.audio_by_stem)
+                                                           if self.in_shard(s)), key=natural_key)
+        return unmatched
+
+    def report(self):
+        """human readable lines describing what did not pair up
+        """
+        lines = []
+        for kind, stems in self.unmatched().items():
+            if stems:
+                preview = ', '.join(stems[:5]) + (', ...' if len(stems) > 5 else '')
+                lines.append(f"{kind.replace('_', ' ')}: {len(stems)} ({preview})")
+        if self.text_paired_by_order and self.text_count and self.text_count != self.corpus_count:
+            lines.append(f"texts ({self.text_count}) and audio files ({self.corpus_count}) differ in number.")
+        if self.text_stems and self.text_paired_by_order:
+            lines.append("text blocks share no names with audio files, paired by order.")
+        if self.reference_paired_by_order:
+            lines.append("reference files share no names with audio files, paired by order.")
+            if len(self.reference_by_stem) != self.corpus_count:
+                lines.append(f"reference files ({len(self.reference_by_stem)}) and audio files ({self.corpus_count}) differ in number.")
+        if self.shard is not None:
+            lines.append(f"shard {self.shard[0]}/{self.shard[1]}: {len(self.stems)} of {self.corpus_count} audio files.")
+        return lines
@@ -0,0 +1,121 @@
+"""Merge the results of the shards of one folder into a single result set and summary.
+
+    python merge_results.py results_audio_shard1of3.jsonl results_audio_shard2of3.jsonl results_audio_shard3of3.jsonl
+
+Each shard is reduced to the latest verdict per file and sorted by file stem, then all shards are
+k-way merged by stem in one streaming pass that writes the unified journal and text report, counts
+the summary and collects files rated differently in different shards.
+"""
+import csv
+import heapq
+import itertools
+import os
+import re
+import sys
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+
+from batch_summary import read_records
+from manifest import file_stem, natural_key
+from result_stats import ResultStats, format_summary
+from results_journal import VERDICTS, ResultsJournal, format_txt_record
+
+
+_SHARD_SUFFIX = re.compile(r'_shard\d+of\d+$')
+WRITE_BATCH = 10000
+
+
+def sorted_shard(result_file, shard_index):
+    """yield (stem key, stem, shard_index, record) for the latest verdict of every file in one shard, by stem
+
+    The stem itself follows its key, so stems with the same natural key ('x01', 'x1') never interleave;
+    the shard index breaks ties in the merge, so the first result file's record leads each group.
+    """
+    latest = {}
+    for record in read_records(result_file):
+        if record.get('result') in VERDICTS:
+            latest[file_stem(record['file'])] = record
+    for key, stem in sorted((natural_key(stem), stem) for stem in latest):
+        yield key, stem, shard_index, latest[stem]
+
+
+def merged_name(result_files):
+    """results_<folder>_merged from results_<folder>_shard<i>of<N>.<ext>
+
+    Never results_<folder> itself, which is the journal of the unsharded folder.
+    """
+    name = os.path.splitext(os.path.basename(result_files[0]))[0]
+    return f"{_SHARD_SUFFIX.sub('', name)}_merged"
+
+
+def merge_results(result_files, output, force=False):
+    """merge result_files into <output>.jsonl and <output>.txt, returns (summary, conflicts)
+
+    conflicts lists (stem, {result file: result}) for files with different verdicts in different shards;
+    the verdict of the first result file that rated the file is kept. Existing output files are only
+    replaced with force, FileExistsError otherwise.
+    """
+    outputs = [f"{output}.jsonl", f"{output}.txt"]
+    existing = [path for path in outputs if os.path.exists(path)]
+    if any(os.path.abspath(path) in map(os.path.abspath, result_files) for path in outputs):
+        raise FileExistsError(f"'{output}' would overwrite one of the result files being merged")
+    if existing and not force:
+        raise FileExistsError(f"{', '.join(existing)} already exist, pass --force to replace them")
+    shards = [sorted_shard(path, index) for index, path in enumerate(result_files)]
+    journal = ResultsJournal(outputs[0])
+    if os.path.exists(journal.path):
+        os.remove(journal.path)
+    stats = ResultStats()
+    conflicts = []
+    batch = []
+    with open(f"{output}.txt", 'w', encoding='utf-8') as txt:
+        merged = heapq.merge(*shards, key=lambda item: item[:3])
+        for stem, group in itertools.groupby(merged, key=lambda item: item[1]):
+            group = list(group)
+            record = group[0][3]
+            if len({item[3]['result'] for item in group}) > 1:
+                conflicts.append((stem, {result_files[item[2]]: item[3]['result'] for item in group}))
+            stats.add(record)
+            txt.write(format_txt_record(record))
+            batch.append(record)
+            if len(batch) >= WRITE_BATCH:
+                journal.append(batch)
+                batch = []
+        journal.append(batch)
+        summary = stats.summary()
+        txt.writelines(format_summary(summary))
+    return summary, conflicts
+
+
+def main(argv=None):
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter, description=__doc__.splitlines()[0])
+    parser.add_argument('result_files', nargs='+', help='results_<folder>_shard<i>of<N>.jsonl/.txt/.xlsx files')
+    parser.add_argument('--output', type=str, default=None,
+                        help='output name without extension, defaults to results_<folder>_merged of the first shard')
+    parser.add_argument('--force', action='store_true', help='replace existing output files')
+    args = parser.parse_args(argv)
+
+    missing = [path for path in args.result_files if not os.path.isfile(path)]
+    if missing:
+        print(f"Result files not found: {', '.join(missing)}")
+        return 1
+    output = args.output or os.path.join(os.path.dirname(args.result_files[0]), merged_name(args.result_files))
+    try:
+        summary, conflicts = merge_results(args.result_files, output, args.force)
+    except FileExistsError as e:
+        print(f"Not merging: {e}")
+        return 1
+    print(f"{sum(summary[verdict] for verdict in VERDICTS)} files merged into '{output}.jsonl' and '{output}.txt'.")
+    if conflicts:
+        with open(f"{output}_conflicts.csv", 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['stem', 'kept'] + list(args.result_files))
+            for stem, results in conflicts:
+                kept = next(results[path] for path in args.result_files if path in results)
+                writer.writerow([stem, kept] + [results.get(path, '') for path in args.result_files])
+        print(f"{len(conflicts)} files were rated differently in different shards, see '{output}_conflicts.csv'.")
+    print(''.join(format_summary(summary)).strip())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
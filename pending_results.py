@@ -0,0 +1,47 @@
+from results_journal import VERDICTS
+
+
+VERDICT_CODES = {verdict: code for code, verdict in enumerate(VERDICTS)}
+
+
+class PendingVerdict:
+    """one clip's unsaved verdict, the verdict as its index in VERDICTS
+    """
+    __slots__ = ('code', 'error_word', 'note', 'rated_at')
+
+    def __init__(self, code, error_word, note, rated_at):
+        self.code = code
+        self.error_word = error_word
+        self.note = note
+        self.rated_at = rated_at
+
+    @property
+    def result(self):
+        return VERDICTS[self.code]
+
+
+class PendingResults:
+    """verdicts given since the last save, keyed by clip index
+
+    A clip rated again before the save overwrites its verdict in place, and no text is kept: the
+    record's text and file name are looked up from the clip index when the verdicts are taken.
+    """
+    def __init__(self):
+        self.verdicts = {}      # clip index -> PendingVerdict, in the order the clips were first rated
+
+    def __len__(self):
+        return len(self.verdicts)
+
+    def set(self, index, result, error_word='', note='', rated_at=None):
+        verdict = self.verdicts.get(index)
+        if verdict is None:
+            self.verdicts[index] = PendingVerdict(VERDICT_CODES[result], error_word, note, rated_at)
+        else:
+            verdict.code, verdict.error_word, verdict.note, verdict.rated_at = (
+                VERDICT_CODES[result], error_word, note, rated_at)
+
+    def take(self):
+        """[(clip index, PendingVerdict)] of every pending verdict, which are then no longer pending
+        """
+        verdicts, self.verdicts = self.verdicts, {}
+        return list(verdicts.items())
@@ -0,0 +1,227 @@
+"""Signal pre-screen of an audio folder: flag silent, clipped or truncated clips before anyone listens.
+
+    python prescreen.py --audio_folder audio_folder --text_file test.txt --process_num 8 --flagged_only
+"""
+import csv
+import math
+import multiprocessing
+import os
+import sys
+import wave
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+from audio_archive import folder_name, is_archive, split_sequential, stat_audio
+from audio_signal import pcm_to_mono
+from audio_stream import WavStream
+
+
+# signal features cached per file, valid while size and mtime_ns are unchanged
+FEATURE_COLUMNS = ['file', 'size', 'mtime_ns', 'duration_ms', 'rms_db', 'silence_ratio', 'clipping_rate']
+REPORT_COLUMNS = FEATURE_COLUMNS[:1] + FEATURE_COLUMNS[3:] + ['text_chars', 'ms_per_char', 'flags']
+
+FRAME_MS = 10
+SILENCE_DB = -50.0          # 10 ms frames quieter than this count as silence
+SILENT_RATIO = 0.95         # a clip that is this much silence is flagged 'silent'
+CLIPPING_RATE = 0.001       # share of samples at full scale above which a clip is flagged 'clipped'
+MIN_MS_PER_CHAR = 30.0      # less audio than this per text character is flagged 'truncated'
+
+
+def prescreen_path(folder):
+    """feature table of an audio folder, next to its results: prescreen_<folder>.csv
+    """
+    return f"prescreen_{folder_name(folder)}.csv"
+
+
+def clip_features(path, block_frames=1 << 20):
+    """duration, overall RMS (dBFS), silence ratio and clipping rate of one wav file
+
+    The file is memory-mapped and converted block_frames at a time, so long recordings are fine too.
+    """
+    import numpy as np
+    stat = stat_audio(path)
+    stream = WavStream(path)
+    hop = max(int(stream.sample_rate * FRAME_MS / 1000), 1)
+    block_frames = max(block_frames // hop, 1) * hop        # blocks hold whole frames
+    full_scale = 1 - 2 / (1 << (8 * stream.bytes_per_sample))
+    silence_power = 10 ** (SILENCE_DB / 10)
+    total_power, clipped, silent_frames, frames = 0.0, 0, 0, 0
+    for start in range(0, stream.num_frames, block_frames):
+        samples = pcm_to_mono(stream, start, start + block_frames)
+        total_power += float(np.dot(samples, samples))
+        clipped += int(np.count_nonzero(np.abs(samples) >= full_scale))
+        usable = len(samples) // hop * hop
+        if usable:
+            power = np.mean(samples[:usable].reshape(-1, hop) ** 2, axis=1)
+            silent_frames += int(np.count_nonzero(power < silence_power))
+            frames += len(power)
+    num_samples = stream.num_frames
+    rms = math.sqrt(total_power / num_samples) if num_samples else 0.0
+    return {
+        'file': os.path.basename(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'duration_ms': round(stream.duration_ms, 1),
+        'rms_db': round(20 * math.log10(rms), 2) if rms > 0 else -math.inf,
+        'silence_ratio': round(silent_frames / frames, 4) if frames else 1.0,
+        'clipping_rate': round(clipped / num_samples, 6) if num_samples else 0.0,
+    }
+
+
+def _safe_features(path):
+    """features of path, or a row of NaN features if they cannot be computed, so the file is only
+    tried again once it changes; None if the file is gone
+    """
+    try:
+        return clip_features(path)
+    except (OSError, ValueError, wave.Error) as e:
+        print(f"Pre-screen of '{os.path.basename(path)}' failed: {e}")
+    try:
+        stat = stat_audio(path)
+    except OSError:
+        return None
+    return {'file': os.path.basename(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            **dict.fromkeys(FEATURE_COLUMNS[3:], math.nan)}
+
+
+def flag_reasons(row):
+    """why a clip needs attention: 'silent', 'clipped' and/or 'truncated' (empty if none)
+    """
+    reasons = []
+    if row['silence_ratio'] >= SILENT_RATIO:
+        reasons.append('silent')
+    if row['clipping_rate'] > CLIPPING_RATE:
+        reasons.append('clipped')
+    if row.get('ms_per_char') is not None and row['ms_per_char'] < MIN_MS_PER_CHAR:
+        reasons.append('truncated')
+    return reasons
+
+
+def clip_text(text_index, manifest, index):
+    """text of the clip at index, paired the same way get_text_ultimate pairs it, None if there is none
+    """
+    if text_index is None:
+        return None
+    if text_index.block_names and not manifest.text_paired_by_order:
+        return text_index.text_for(manifest.audio_files[index])
+    return text_index.text_at(manifest.text_position(index))
+
+
+class FeatureTable:
+    """file name -> cached signal features, stored as CSV; files that could not be read have NaN features
+    """
+    def __init__(self, path):
+        self.path = path
+        self.rows = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8', newline='') as f:
+                for row in csv.DictReader(f):
+                    self.rows[row['file']] = {'file': row['file'], 'size': int(row['size']),
+                                              'mtime_ns': int(row['mtime_ns']),
+                                              **{column: float(row[column]) for column in FEATURE_COLUMNS[3:]}}
+
+    def get(self, path):
+        """cached features of path, None if missing or the file changed since
+        """
+        row = self.rows.get(os.path.basename(path))
+        try:
+            stat = stat_audio(path)
+        except OSError:
+            return None
+        if row is None or row['size'] != stat.st_size or row['mtime_ns'] != stat.st_mtime_ns:
+            return None
+        return row
+
+    def update(self, paths, process_num=1):
+        """compute the features of every path that is not cached yet, returns how many were computed
+
+        Members of a compressed tar are computed in one pass in this process, the others on process_num
+        processes. The processes are spawned, as forking is unsafe from the GUI's worker threads.
+        """
+        sequential, missing = split_sequential([path for path in paths if self.get(path) is None])
+        computed = [_safe_features(path) for path in sequential]
+        if process_num > 1 and len(missing) > 1:
+            spawn = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=process_num, mp_context=spawn) as executor:
+                computed.extend(executor.map(_safe_features, missing, chunksize=64))
+        else:
+            computed.extend(_safe_features(path) for path in missing)
+        for row in computed:
+            if row is not None:
+                self.rows[row['file']] = row
+        return len(sequential) + len(missing)
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FEATURE_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.rows.values())
+        os.replace(temp_path, self.path)
+
+
+def prescreen(manifest, table_path, text_index=None, process_num=1):
+    """feature rows of every clip in manifest order, with text length, ms per character and flags
+
+    Features are read from the folder's table and only computed for new or changed files.
+    """
+    table = FeatureTable(table_path)
+    if table.update(manifest.audio_files, process_num):
+        table.save()
+    rows = []
+    for index, path in enumerate(manifest.audio_files):
+        features = table.get(path)
+        if features is None or math.isnan(features['duration_ms']):
+            continue
+        row = dict(features)
+        text = clip_text(text_index, manifest, index)
+        chars = len(''.join(text.split())) if text else 0
+        row['text_chars'] = chars
+        row['ms_per_char'] = round(row['duration_ms'] / chars, 1) if chars else None
+        row['flags'] = flag_reasons(row)
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    from manifest import Manifest
+    from text_index import TextIndex
+
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter, description=__doc__.splitlines()[0])
+    parser.add_argument('--audio_folder', type=str, required=True)
+    parser.add_argument('--text_file', type=str, default=None)
+    parser.add_argument('--process_num', type=int, default=1)
+    parser.add_argument('--sort', type=str, default='flags', choices=['flags'] + REPORT_COLUMNS[:-1],
+                        help="'flags' lists flagged clips first")
+    parser.add_argument('--flagged_only', action='store_true')
+    parser.add_argument('--output', type=str, default=None, help='report CSV, defaults to prescreen_<folder>_report.csv')
+    args = parser.parse_args(argv)
+
+    if not (os.path.isdir(args.audio_folder) or is_archive(args.audio_folder)):
+        print(f"Audio folder '{args.audio_folder}' not found.")
+        return 1
+    text_index = TextIndex(args.text_file) if args.text_file else None
+    manifest = Manifest(args.audio_folder, text_index)
+    rows = prescreen(manifest, prescreen_path(args.audio_folder), text_index, args.process_num)
+    if args.flagged_only:
+        rows = [row for row in rows if row['flags']]
+    if args.sort == 'flags':
+        rows.sort(key=lambda row: -len(row['flags']))       # stable, manifest order within each group
+    elif args.sort != 'file':
+        rows.sort(key=lambda row: math.inf if row[args.sort] is None else row[args.sort])
+
+    output = args.output or prescreen_path(args.audio_folder).replace('.csv', '_report.csv')
+    with open(output, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows({**row, 'flags': ' '.join(row['flags'])} for row in rows)
+    counts = {}
+    for row in rows:
+        for reason in row['flags']:
+            counts[reason] = counts.get(reason, 0) + 1
+    print(f"{len(rows)} clips written to '{output}', flagged: {counts or 'none'}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
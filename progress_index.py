@@ -0,0 +1,64 @@
+import os
+
+from results_journal import VERDICTS, results_path
+
+
+class ProgressIndex:
+    """which files of a folder are rated, as compact 'file<TAB>result' lines next to the journal
+
+    Every save appends the new verdicts, so resuming reads a few bytes per rated clip instead of
+    parsing the journal with all its texts and notes. The latest line of a file wins.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.verdicts = {}      # file -> latest result
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    filename, _, result = line.rstrip('\n').rpartition('\t')
+                    if filename and result in VERDICTS:
+                        self.verdicts[filename] = result
+
+    @classmethod
+    def for_folder(cls, folder, journal=None, shard=None):
+        """progress of an audio folder, rebuilt from the journal once if it is missing or older than it
+
+        The index is written right after the journal, so it is only older after a crash in between saves.
+        """
+        path = results_path(folder, 'progress', shard)
+        if journal is not None and os.path.exists(journal.path) and (
+                not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(journal.path)):
+            index = cls(path)
+            index.verdicts = {record['file']: record['result'] for record in journal
+                              if record.get('result') in VERDICTS}
+            index.rewrite()
+            return index
+        return cls(path)
+
+    def append(self, records):
+        """note the verdicts of newly saved records
+        """
+        lines = []
+        for record in records:
+            if record.get('result') in VERDICTS:
+                self.verdicts[record['file']] = record['result']
+                lines.append(f"{record['file']}\t{record['result']}\n")
+        if lines:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.writelines(lines)
+
+    def rewrite(self):
+        """write the index from scratch with one line per rated file
+        """
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.writelines(f"{filename}\t{result}\n" for filename, result in self.verdicts.items())
+        os.replace(temp_path, self.path)
+
+    def first_unrated(self, audio_files):
+        """index of the first file in audio_files without a verdict, None if all are rated
+        """
+        for index, path in enumerate(audio_files):
+            if os.path.basename(path) not in self.verdicts:
+                return index
+        return None
@@ -1,12 +1,29 @@
 import sys
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
 from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QTextEdit, QLabel, \
-                            QVBoxLayout, QWidget, QHBoxLayout, QSlider, QListWidget
-from PyQt5.QtCore import QTimer, Qt
-import simpleaudio as sa
-import wave
-import pandas as pd
+                            QVBoxLayout, QWidget, QHBoxLayout, QSlider, QListView, QProgressBar
+from PyQt5.QtCore import QTimer, Qt, QAbstractListModel, QModelIndex, QObject, QEvent, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QPainter, QPen
+from audio_backend import BACKENDS, create_backend
+from audio_cache import AudioCache, AudioPrefetcher
+from audio_signal import estimate_offset_ms
+from audio_stream import StreamPlayer, WavStream
+from content_index import DEFAULT_INDEX_PATH, ContentIndex
+from instrumentation import Metrics
+from text_index import TextIndex
+from manifest import Manifest, parse_shard
+from pending_results import PendingResults
+from prescreen import prescreen, prescreen_path
+from progress_index import ProgressIndex
+from results_columnar import export_columnar
+from results_journal import RESULT_COLUMNS, ResultsJournal, results_path, run_name
+from results_writer import ResultsWriter
+from thumbnail_cache import DEFAULT_CACHE_DIR, ThumbnailCache
+from result_stats import ResultStats, format_summary, metrics_table
 
 
 class ClickableSlider(QSlider):
@@ -25,30 +42,267 @@ class ClickableSlider(QSlider):
         self.sliderReleased.emit()
         
 
+class WaveformStrip(QWidget):
+    """spectrogram with the waveform peaks drawn over it and a playhead, painted from a cached thumbnail
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedHeight(60)
+        self.image = None
+        self.low = self.high = None
+        self.position = None
+
+    def set_thumbnail(self, thumbnail):
+        """thumbnail is a ThumbnailCache dict, None clears the strip
+        """
+        if thumbnail is None:
+            self.image = self.low = self.high = None
+        else:
+            spectrogram = thumbnail['spectrogram']
+            height, width = spectrogram.shape
+            # copy() so the image owns its pixels once the array goes away
+            self.image = QImage(spectrogram.tobytes(), width, height, width, QImage.Format_Grayscale8).copy()
+            self.low, self.high = thumbnail['low'].tolist(), thumbnail['high'].tolist()
+        self.update()
+
+    def set_position(self, fraction):
+        """playhead at fraction of the clip, None hides it
+        """
+        if fraction != self.position:
+            self.position = fraction
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width, height = self.width(), self.height()
+        painter.fillRect(0, 0, width, height, QColor('#202020'))
+        if self.image is not None:
+            painter.drawImage(self.rect(), self.image)
+            painter.setPen(QPen(QColor('#4ec94e')))
+            columns, middle = len(self.high), height / 2
+            for x in range(width):
+                column = x * columns // width
+                painter.drawLine(x, int(middle - self.high[column] * middle), x, int(middle - self.low[column] * middle))
+        if self.position is not None:
+            painter.setPen(QPen(QColor('#e05252')))
+            x = int(self.position * width)
+            painter.drawLine(x, 0, x, height)
+
+
+class AudioListModel(QAbstractListModel):
+    """file list over the manifest, row text is only built when the view paints the row
+    """
+    GOOD_VERDICTS = ('TP', 'TN', 'T')
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.audio_files = []
+        self.verdicts = {}
+        self.flags = {}
+        self.inherited = {}
+
+    def set_files(self, audio_files, verdicts):
+        """audio_files is the manifest order, verdicts the live file -> result dict of the stats
+        """
+        self.beginResetModel()
+        self.audio_files = audio_files
+        self.verdicts = verdicts
+        self.flags = {}
+        self.inherited = {}
+        self.endResetModel()
+
+    def append_file(self, audio_file):
+        """add one row at the end, for clips that arrive one at a time from a work server
+        """
+        row = len(self.audio_files)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.audio_files.append(audio_file)
+        self.endInsertRows()
+
+    def set_flags(self, flags):
+        """file -> pre-screen reasons ('silent', 'clipped', 'truncated') of the clips that need attention
+        """
+        self.flags = flags
+        self.refresh_all()
+
+    def set_inherited(self, inherited):
+        """file -> record of identical audio rated before, shown until the file gets a verdict of its own
+        """
+        self.inherited = inherited
+        self.refresh_all()
+
+    def refresh_all(self):
+        if self.audio_files:
+            self.dataChanged.emit(self.index(0), self.index(len(self.audio_files) - 1))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.audio_files)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        filename = os.path.basename(self.audio_files[index.row()])
+        verdict = self.verdicts.get(filename)
+        flags = self.flags.get(filename)
+        inherited = self.inherited.get(filename) if not verdict else None
+        if inherited:
+            verdict = inherited['result']
+        if role == Qt.DisplayRole:
+            if inherited:
+                return f"{filename}  [{verdict} ↺]"
+            if verdict:
+                return f"{filename}  [{verdict}]"
+            return f"{filename}  ⚑ {' '.join(flags)}" if flags else filename
+        if role == Qt.ForegroundRole and verdict:
+            return QColor('#4ec94e') if verdict in self.GOOD_VERDICTS else QColor('#e05252')
+        if role == Qt.ForegroundRole and flags:
+            return QColor('#e0a030')
+        if role == Qt.ToolTipRole:
+            lines = [self.audio_files[index.row()]]
+            if inherited:
+                lines.append(f"same audio as {inherited['inherited_from']}")
+            if flags:
+                lines.append(f"pre-screen: {', '.join(flags)}")
+            return '\n'.join(lines)
+        return None
+
+    def refresh_row(self, row):
+        """repaint the status badge of one row
+        """
+        if 0 <= row < len(self.audio_files):
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+
+class CorpusLoader(QObject):
+    """index the text file, scan the folders and read earlier results on a worker thread
+
+    progress reports each stage, loaded hands (text_index, manifest, journal, progress index, stats)
+    back to the GUI thread.
+    """
+    progress = pyqtSignal(str)
+    loaded = pyqtSignal(object)
+
+    def start(self, audio_folder, text_file, reference_audio_folder, shard=None):
+        threading.Thread(target=self._run, args=(audio_folder, text_file, reference_audio_folder, shard),
+                         daemon=True).start()
+
+    def _run(self, audio_folder, text_file, reference_audio_folder, shard):
+        self.progress.emit("Indexing text file...")
+        text_index = TextIndex(text_file)
+        self.progress.emit("Scanning audio folders...")
+        manifest = Manifest(audio_folder, text_index, reference_audio_folder, shard=shard)
+        self.progress.emit("Reading saved progress...")
+        journal = ResultsJournal.for_folder(audio_folder, shard)
+        progress_index = ProgressIndex.for_folder(audio_folder, journal, shard)
+        stats = ResultStats.from_verdicts(progress_index.verdicts)
+        self.loaded.emit((text_index, manifest, journal, progress_index, stats))
+
+
 class PyqtEvaluationTool(QMainWindow):
-    def __init__(self):
+    # (file path, thumbnail dict) from the thumbnail pool, delivered on the GUI thread
+    thumbnail_ready = pyqtSignal(str, object)
+    # (audio folder, pre-screen rows) from the pre-screen thread
+    prescreen_ready = pyqtSignal(str, object)
+    # (audio folder, inherited records) from the content hashing thread
+    inherited_ready = pyqtSignal(str, object)
+    # the work server's next lease is ready, emitted by the lease prefetch thread
+    lease_ready = pyqtSignal()
+
+    def __init__(self, prefetch_num=4, cache_mb=256, stream_mb=64, stream_chunk_ms=5000, audio_backend=None,
+                 metrics_out=None, thumbnail_dir=DEFAULT_CACHE_DIR, prescreen_process_num=1,
+                 content_index_path=DEFAULT_INDEX_PATH, duplicates='prefill', autosave_every=20, autosave_s=30,
+                 work_client=None, shard=None, annotator=None, columnar='parquet'):
         super().__init__()
         self.setWindowTitle("Audio Evaluation Tool")
         self.setup_ui()
         self.initialize_variables()
         self.setup_timer()
         self.reference_audio_files = []
+        # decoded clips are shared by load_audio and the background prefetcher
+        self.prefetch_num = prefetch_num
+        # recordings above stream_mb are played chunk by chunk from a memory-mapped file
+        self.stream_chunk_ms = stream_chunk_ms
+        self.audio_cache = AudioCache(max_bytes=cache_mb * 1024 * 1024, stream_bytes=stream_mb * 1024 * 1024)
+        # timing spans of the hot paths, written to metrics_out (.json or .prom) when the window closes
+        self.metrics = Metrics()
+        self.metrics_out = metrics_out
+        self.audio_cache.metrics = self.metrics
+        self.clip_shown_at = None
+        self.prefetcher = AudioPrefetcher(self.audio_cache)
+        # test/reference alignments, computed in the background: (test path, reference path) -> offset ms or None
+        self.alignments = {}
+        self.analysis_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='audio-analysis')
+        # waveform/spectrogram strips are rendered off the GUI thread and kept on disk by path and mtime
+        self.thumbnails = ThumbnailCache(thumbnail_dir)
+        self.thumbnail_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='thumbnail')
+        self.thumbnail_ready.connect(self.on_thumbnail_ready)
+        # silent / clipped / truncated clips are flagged in the list, 0 processes turns the pre-screen off
+        self.prescreen_process_num = prescreen_process_num
+        self.prescreen_rows = []
+        self.prescreen_ready.connect(self.on_prescreen_ready)
+        # verdicts follow the audio content across folders: 'prefill' shows them for identical clips,
+        # 'hide' also skips those clips when moving on, 'off' does neither
+        self.duplicates = duplicates
+        self.content_index_path = content_index_path
+        self.content_index = None
+        self.content_index_lock = threading.Lock()
+        self.inherited = {}
+        self.inherited_ready.connect(self.on_inherited_ready)
+        # saves only queue the new results, a writer thread appends them; autosave every
+        # autosave_every verdicts or autosave_s seconds, and once more when the window closes
+        self.results_writer = ResultsWriter(self.write_records, self.metrics)
+        self.autosave_every = autosave_every
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setInterval(int(autosave_s * 1000))
+        self.autosave_timer.timeout.connect(self.save_progress)
+        self.autosave_timer.start()
+        # with a work server, clips come one lease at a time and verdicts go back to the server
+        self.work_client = work_client
+        self.lease_prefetcher = None
+        self.remote_texts = {}      # clip key -> text sent with its lease
+        self.remote_leases = {}     # file name -> lease id, until its verdict reached the server
+        # the list ran out and the next lease is still on its way, it is shown when lease_ready comes
+        self.waiting_for_lease = False
+        self.lease_ready.connect(self.on_lease_ready)
+        # (i, N): only shard i of N of the folder is loaded, and its results are saved under their own name
+        self.shard = shard
+        # every verdict is saved with the session that gave it and when, for the columnar export
+        self.session = f"{annotator or 'anonymous'}-{time.strftime('%Y%m%dT%H%M%S')}"
+        # the summary also exports the results as 'parquet' or 'arrow' (needs pyarrow), 'off' does not
+        self.columnar = columnar
+        # every play/stop goes through the backend, the null backend needs no sound device
+        self.audio_backend = audio_backend if audio_backend is not None else create_backend('simpleaudio')
         
-    def setup_timer(self):
-        """timer for updating the slider
+    def setup_timer(self, refresh_hz=30):
+        """timer for repainting the slider, the position itself comes from the playback clock
         """
         self.timer = QTimer(self)
-        self.timer.setInterval(10)  # Timer interval set to 10 milliseconds
+        self.timer.setInterval(1000 // refresh_hz)  # ~33 ms at 30 Hz
         self.timer.timeout.connect(self.update_slider)
         
     def initialize_variables(self):
         self.audio_files = []
         self.current_index = 0
-        self.results = []  # list to store the results
+        self.results = PendingResults()  # verdicts not saved yet, by clip index
         self.play_obj = None
-        self.texts = []
+        self.audio_clip = None
+        self.audio_data = None
+        self.reference_audio_clip = None
+        self.reference_audio_path = None
+        self.reference_audio_data = None
+        self.playing_reference = False
+        self.text_index = None
+        self.manifest = None
+        self.audio_folder = None
+        self.journal = None
+        self.progress_index = None
+        self.stats = ResultStats()
         self.audio_position = 0
         self.audio_duration_ms = 0
+        self.playback_start_ms = 0
+        self.playback_started_at = 0.0
+        self.playback_duration_ms = 0
         
     def setup_ui(self):
         """UI setup
@@ -82,7 +336,7 @@ class PyqtEvaluationTool(QMainWindow):
             color: #d4d4d4;
             border: none;
             }
-            QListWidget {
+            QListView {
             background-color: #252526;
             font-size: 14pt;
             font-family: Microsoft YaHei UI;
@@ -145,6 +399,17 @@ class PyqtEvaluationTool(QMainWindow):
         title_layout.addWidget(self.title_label)
         title_layout.addStretch()
         
+        # busy indicator while the corpus loads in the background
+        self.loading_label = QLabel("", self.title_bar)
+        self.loading_bar = QProgressBar(self.title_bar)
+        self.loading_bar.setRange(0, 0)
+        self.loading_bar.setFixedSize(160, 12)
+        self.loading_bar.setTextVisible(False)
+        self.loading_label.hide()
+        self.loading_bar.hide()
+        title_layout.addWidget(self.loading_label)
+        title_layout.addWidget(self.loading_bar)
+        
         self.close_button = QPushButton('\u2715', self)
         self.close_button.setFixedSize(40, 40)
         self.close_button.setStyleSheet("""
@@ -164,9 +429,12 @@ class PyqtEvaluationTool(QMainWindow):
         title_layout.setContentsMargins(0, 0, 0, 0)
         
         # 左侧列表控件
-        self.list_widget = QListWidget()
-        self.list_widget.setStyleSheet("font-size: 11pt;")
-        self.list_widget.itemClicked.connect(self.on_item_clicked)
+        self.file_model = AudioListModel(self)
+        self.list_view = QListView()
+        self.list_view.setUniformItemSizes(True)    # lets the view skip measuring every row
+        self.list_view.setModel(self.file_model)
+        self.list_view.setStyleSheet("font-size: 11pt;")
+        self.list_view.clicked.connect(self.on_item_clicked)
 
         # right layout for text display, note, progress bar, and buttons
         right_layout = QVBoxLayout()
@@ -209,6 +477,13 @@ class PyqtEvaluationTool(QMainWindow):
         self.play_reference_button.clicked.connect(self.play_reference_audio_button_clicked)
         reference_layout.addWidget(self.play_reference_button)
         
+        self.ab_button = QPushButton("A/B", self)
+        self.ab_button.setStyleSheet("font-size: 12pt; background-color: #5a3fa0;")
+        self.ab_button.setFixedSize(80, 40)
+        self.ab_button.setToolTip("Switch between test and reference audio at the matching position")
+        self.ab_button.clicked.connect(self.toggle_ab)
+        reference_layout.addWidget(self.ab_button)
+        
         right_layout.addLayout(reference_layout)
         
         # Note text box
@@ -225,6 +500,8 @@ class PyqtEvaluationTool(QMainWindow):
         self.progress_slider.sliderPressed.connect(self.seek_audio)
         progressbar_layout.addWidget(self.progress_slider)        
         
+        self.waveform_strip = WaveformStrip(self)
+        right_layout.addWidget(self.waveform_strip)
         right_layout.addLayout(progressbar_layout)
         
         # Next button
@@ -302,7 +579,7 @@ class PyqtEvaluationTool(QMainWindow):
 
         main_layout.setContentsMargins(8, 8, 8, 8)
         main_layout.setSpacing(5)
-        main_layout.addWidget(self.list_widget, 1)
+        main_layout.addWidget(self.list_view, 1)
         main_layout.addLayout(right_layout, 5)
 
         container = QWidget()
@@ -339,122 +616,346 @@ class PyqtEvaluationTool(QMainWindow):
         self.drag_position = None
         super().mouseReleaseEvent(event)
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.start_slider_timer()
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.WindowStateChange:
+            if self.isMinimized():
+                self.timer.stop()
+            else:
+                self.start_slider_timer()
+        super().changeEvent(event)
+
+    def hideEvent(self, event):
+        # nothing to repaint while hidden or minimized, the clock keeps the position anyway
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def closeEvent(self, event):
+        self.autosave_timer.stop()
+        self.save_progress()
+        self.results_writer.close()
+        if self.lease_prefetcher is not None:
+            self.lease_prefetcher.close()
+            self.work_client.close()
+        self.prefetcher.shutdown()
+        self.analysis_pool.shutdown(wait=False, cancel_futures=True)
+        self.thumbnail_pool.shutdown(wait=False, cancel_futures=True)
+        print(f"Audio cache: {self.audio_cache.stats()}")
+        if self.metrics_out:
+            self.metrics.export(self.metrics_out)
+        super().closeEvent(event)
+
     def play_reference_audio_button_clicked(self):
-        if self.reference_audio_files and 0 <= self.current_index < len(self.reference_audio_files):
+        if 0 <= self.current_index < len(self.reference_audio_files) and self.reference_audio_files[self.current_index]:
             self.load_reference_audio(self.reference_audio_files[self.current_index])
         else:
             print("No reference audio files or index out of range")
 
     def load_files(self, audio_folder, text_file, reference_audio_folder=None):
-        """load audio files and text file
+        """load audio files and text file, in the background so the window stays usable meanwhile
         """
-        self.switch_layout()
-        self.texts = []
-        if os.path.exists(text_file):
-            with open(text_file, 'r', encoding='utf-8') as f:
-                self.texts = f.read().splitlines()
-        else:
+        if not os.path.exists(text_file):
             print(f"Text file '{text_file}' not found.")
             return
-
-        if os.path.exists(audio_folder):
-            self.audio_files = [
-                os.path.join(audio_folder, f) 
-                for f in os.listdir(audio_folder) 
-                if f.endswith('.wav')
-            ]
-            for file in self.audio_files:
-                filename = os.path.basename(file)
-                self.list_widget.addItem(filename)
-            try:
-                self.current_index = 0      # current_index starts from 0
-                self.load_audio(self.audio_files[self.current_index])
-            except ValueError:
-                print("Index initialization error.")
-                self.current_index = 0
-        else:
+        if not os.path.exists(audio_folder):
             print(f"Audio folder '{audio_folder}' not found.")
+            self.manifest = None
             self.audio_files = []
-            
-        if reference_audio_folder and os.path.exists(reference_audio_folder):
-            self.reference_audio_files = [
-                os.path.join(reference_audio_folder, f) 
-                for f in os.listdir(reference_audio_folder) 
-                if f.endswith('.wav')
-            ]
+            self.reference_audio_files = []
+            return
+
+        # on_corpus_loaded finishes loading once the worker is done
+        self.audio_folder = audio_folder
+        self.corpus_loader = CorpusLoader(self)
+        self.corpus_loader.progress.connect(self.on_corpus_progress)
+        self.corpus_loader.loaded.connect(self.on_corpus_loaded)
+        self.on_corpus_progress("Loading...")
+        self.corpus_loader.start(audio_folder, text_file, reference_audio_folder, self.shard)
+
+    def on_corpus_progress(self, message):
+        self.loading_label.setText(message)
+        self.loading_label.show()
+        self.loading_bar.show()
+
+    def on_corpus_loaded(self, corpus):
+        """show the scanned folder and start playing its first file
+        """
+        self.loading_label.hide()
+        self.loading_bar.hide()
+        if self.text_index is not None:
+            self.text_index.close()
+        # every get_text_* call is a constant time lookup in the index
+        # audio, text and reference files are paired by name rather than by listing order
+        # running counters and rated badges start from the progress index earlier sessions saved
+        self.text_index, self.manifest, self.journal, self.progress_index, self.stats = corpus
+        for line in self.manifest.report():
+            print(line)
+        self.audio_files = self.manifest.audio_files
+        self.reference_audio_files = self.manifest.reference_files
+        self.file_model.set_files(self.audio_files, self.stats.verdicts)
+        if self.prescreen_process_num > 0 and self.audio_files:
+            threading.Thread(target=self.run_prescreen, daemon=True,
+                             args=(self.audio_folder, self.manifest, self.text_index)).start()
+        self.inherited = {}
+        if self.duplicates != 'off' and self.audio_files:
+            # the verdicts are copied here, mark_result changes them on this thread while the worker runs
+            threading.Thread(target=self.run_content_index, daemon=True,
+                             args=(self.audio_folder, self.audio_files, dict(self.stats.verdicts))).start()
+        try:
+            # resume at the first clip without a verdict
+            first_unrated = self.progress_index.first_unrated(self.audio_files)
+            if first_unrated is None and self.audio_files:
+                print("All clips in this folder are rated.")
+            self.current_index = first_unrated or 0
+            if self.audio_files:
+                self.load_audio(self.audio_files[self.current_index])
+                self.list_view.scrollTo(self.file_model.index(self.current_index), QListView.PositionAtCenter)
+        except ValueError:
+            print("Index initialization error.")
+            self.current_index = 0
     
-    def get_text_ultimate(self):
-        """if first line ends with '.wav', read every n(n>1) lines(pattern1); otherwise, read every line(pattern2)
+    def run_prescreen(self, audio_folder, manifest, text_index):
+        """runs on its own thread, features of unchanged files come from prescreen_<folder>.csv
+        """
+        with self.metrics.span('prescreen'):
+            rows = prescreen(manifest, prescreen_path(audio_folder), text_index, self.prescreen_process_num)
+        self.prescreen_ready.emit(audio_folder, rows)
+
+    def on_prescreen_ready(self, audio_folder, rows):
+        if audio_folder != self.audio_folder:
+            return      # another folder was loaded meanwhile
+        self.prescreen_rows = rows
+        flags = {row['file']: row['flags'] for row in rows if row['flags']}
+        self.file_model.set_flags(flags)
+        if flags:
+            print(f"Pre-screen flagged {len(flags)} of {len(rows)} clips.")
+
+    def get_content_index(self):
+        """the content index, read from disk on first use
+        """
+        with self.content_index_lock:
+            if self.content_index is None:
+                self.content_index = ContentIndex(self.content_index_path)
+            return self.content_index
+
+    def run_content_index(self, audio_folder, audio_files, own_verdicts):
+        """runs on its own thread, only new or changed files are hashed
+        """
+        with self.metrics.span('content_hash'):
+            content_index = self.get_content_index()
+            digests = content_index.update(audio_files)
+        self.inherited_ready.emit(audio_folder, content_index.inherited(digests, own_verdicts))
+
+    def remember_verdicts(self, records):
+        """file the saved verdicts under their audio content, so identical clips elsewhere inherit them
+        """
+        if self.duplicates != 'off' and self.audio_folder and records:
+            self.get_content_index().record(self.audio_files, records)
+
+    def on_inherited_ready(self, audio_folder, inherited):
+        if audio_folder != self.audio_folder:
+            return
+        # clips rated while the worker was hashing keep their own verdict
+        inherited = {file: record for file, record in inherited.items() if file not in self.stats.verdicts}
+        self.inherited = inherited
+        self.file_model.set_inherited(inherited)
+        if inherited:
+            print(f"{len(inherited)} clips have the same audio as clips rated before, their verdicts are shown.")
+
+    def load_remote(self):
+        """start taking clips from the work server, the next lease is always being fetched in the background
+        """
+        from work_queue import LeasePrefetcher
+        print(f"Connected to {self.work_client.address}: folder '{self.work_client.hello['folder']}', "
+              f"{self.work_client.hello['done']} of {self.work_client.hello['clips']} clips done.")
+        self.audio_folder = None
+        self.audio_files = []
+        self.reference_audio_files = []
+        self.file_model.set_files(self.audio_files, self.stats.verdicts)
+        self.current_index = 0
+        self.waiting_for_lease = True
+        self.lease_prefetcher = LeasePrefetcher(self.work_client, on_ready=self.lease_ready.emit)
+
+    def take_lease(self):
+        """append the prefetched lease to the list without waiting, False when none is ready yet
+        (or the server has nothing left, see lease_prefetcher.done)
+        """
+        lease = self.lease_prefetcher.next(0)
+        if lease is None:
+            return False
+        # remote clips live in the audio cache under a key, so playback and A/B work as for local files;
+        # once evicted, they are downloaded again
+        client, index = self.work_client, lease['index']
+        key = f"{client.address}/{lease['file']}"
+        self.audio_cache.add_source(key, lambda: client.clip(index))
+        self.audio_cache.put(key, lease['clip'])
+        reference_key = None
+        if lease['reference_clip'] is not None:
+            reference_key = f"{key}#reference"
+            self.audio_cache.add_source(reference_key, lambda: client.clip(index, True))
+            self.audio_cache.put(reference_key, lease['reference_clip'])
+        self.remote_texts[key] = lease['text'] or "no text available."
+        self.remote_leases[lease['file']] = lease['lease']
+        self.reference_audio_files.append(reference_key)
+        self.file_model.append_file(key)
+        return True
+
+    def on_lease_ready(self):
+        """show the lease the list was waiting for, runs on the GUI thread
+        """
+        if not self.waiting_for_lease:
+            return      # it stays ready for the next verdict
+        if self.take_lease():
+            self.waiting_for_lease = False
+            self.current_index = len(self.audio_files) - 1
+            self.load_audio(self.audio_files[self.current_index])
+        elif self.lease_prefetcher.done:
+            self.waiting_for_lease = False
+            print("The work server has no clips left.")
+
+    def report_end_of_list(self):
+        if self.waiting_for_lease:
+            print("Waiting for the work server's next clip, it is shown as soon as it arrives.")
+        else:
+            print("no more audio files.")
+
+    def next_index(self, index):
+        """first index from index on that still needs a listen, with duplicates hidden that skips inherited clips
         """
-        if not self.texts or self.current_index < 0:
+        if self.lease_prefetcher is not None and index >= len(self.audio_files) and not self.take_lease():
+            # never wait here on the GUI thread, on_lease_ready moves on when the lease arrives
+            self.waiting_for_lease = not self.lease_prefetcher.done
+        if self.duplicates == 'hide':
+            while index < len(self.audio_files):
+                filename = os.path.basename(self.audio_files[index])
+                if filename not in self.inherited or filename in self.stats.verdicts:
+                    break
+                index += 1
+        return index
+
+    def get_text_ultimate(self, index=None):
+        """if first line ends with '.wav', read the block under each '.wav' line(pattern1); otherwise, read every line(pattern2)
+        index is the clip's, the current clip by default
+        """
+        index = self.current_index if index is None else index
+        if self.work_client is not None and 0 <= index < len(self.audio_files):
+            return self.remote_texts[self.audio_files[index]]
+        if not self.text_index or index < 0:
             return "empty text file."
         
-        current_line = 0
-        line = self.texts[current_line].strip()
-        if line.endswith('.wav'):
-            # print("Reding txt every 4 lines")
-            return self.get_text_pattern1()
+        if self.text_index.pattern == TextIndex.PATTERN_BLOCKS:
+            return self.get_text_pattern1(index)
         else:
-            # print("Reding txt every line")
-            return self.get_text_pattern2()
+            return self.get_text_pattern2(index)
 
-    def get_text_pattern1(self, n=4):
-        """return the text block for each audio file, n=4 by default
+    def get_text_pattern1(self, index):
+        """return the text block headed by the audio file's name (or at its position if no names match)
         """
-        if not self.texts or self.current_index < 0:
+        if not self.text_index or not 0 <= index < len(self.audio_files):
             return "no text available."
-        current_line = 0
-        audio_count = 0
-        text_block = []
-        
-        while current_line < len(self.texts):
-            if audio_count == self.current_index:
-                current_line += 1
-                for i in range(n-1):
-                    text_line = self.texts[current_line].strip()
-                    # print(text_line)
-                    text_block.append(text_line)
-                    current_line += 1
-                break
-            audio_count += 1
-            current_line += 1
-            
-        return '\n'.join(text_block) if text_block else "cant find text end with '.wav', please check get_text function."
+        if self.manifest is not None and self.manifest.text_paired_by_order:
+            text = self.text_index.text_at(self.manifest.text_position(index))
+        else:
+            text = self.text_index.text_for(self.audio_files[index])
+        
+        return text if text else "cant find text end with '.wav', please check get_text function."
     
-    def get_text_pattern2(self):
+    def get_text_pattern2(self, index):
         """Read every line
         """
-        if not self.texts or self.current_index < 0:
+        if not self.text_index or index < 0:
             return "no text available."
         
-        return self.texts[self.current_index]
+        position = index
+        if self.manifest is not None and position < len(self.manifest):
+            position = self.manifest.text_position(position)    # differs from current_index in a shard
+        text = self.text_index.text_at(position)
+        return text if text is not None else "no text available."
     
     def load_audio(self, file_path):
         """Load the audio file, set up the audio segment, and start playing from the beginning.
         """
-        # Load the audio file using wave
-        self.audio_read = wave.open(file_path, 'rb')
-        self.audio_data = self.audio_read.readframes(self.audio_read.getnframes())
-        self.num_channels = self.audio_read.getnchannels()
-        self.bytes_per_sample = self.audio_read.getsampwidth()
-        self.sample_rate = self.audio_read.getframerate()
-        self.num_frames = self.audio_read.getnframes()
-        self.audio_duration_ms = self.num_frames / self.sample_rate * 1000
+        with self.metrics.span('file_load'):
+            self._load_audio(file_path)
+        self.clip_shown_at = time.perf_counter()
+
+    def _load_audio(self, file_path):
+        # Decoded by the prefetcher in the background if it got there first
+        # Playback, replay and seeks all slice this one buffer, the wav handle is already closed
+        with self.metrics.span('clip_fetch'):
+            clip = self.prefetcher.get(file_path)
+        self.audio_clip = clip
+        self.audio_data = clip.data
+        self.num_channels = clip.num_channels
+        self.bytes_per_sample = clip.bytes_per_sample
+        self.sample_rate = clip.sample_rate
+        self.num_frames = clip.num_frames
+        self.audio_duration_ms = clip.duration_ms
         self.progress_slider.setRange(0, int(self.audio_duration_ms))
+        self.waveform_strip.set_thumbnail(None)
+        if self.work_client is None:    # thumbnails are cached by file, remote clips have none
+            self.thumbnail_pool.submit(self.render_thumbnail, file_path, clip)
         # Empty the note text box
         self.note.clear()
+        self.list_view.setCurrentIndex(self.file_model.index(self.current_index))
         # Start playing from the beginning
         self.play_audio(0)
+        # keep the reference resident too, so A/B switching never waits on a decode
+        if 0 <= self.current_index < len(self.reference_audio_files) and self.reference_audio_files[self.current_index]:
+            self.set_reference_clip(self.reference_audio_files[self.current_index])
+        else:
+            self.reference_audio_clip = self.reference_audio_path = self.reference_audio_data = None
+        self.prefetch_upcoming()
     
+    def set_reference_clip(self, file_path):
+        """make file_path the resident reference clip and align it with the test clip in the background
+        """
+        if file_path != self.reference_audio_path:
+            clip = self.prefetcher.get(file_path)
+            self.reference_audio_clip = clip
+            self.reference_audio_path = file_path
+            self.reference_audio_data = clip.data
+            self.reference_audio_num_channels = clip.num_channels
+            self.reference_audio_bytes_per_sample = clip.bytes_per_sample
+            self.reference_audio_sample_rate = clip.sample_rate
+            self.reference_audio_num_frames = clip.num_frames
+            self.reference_audio_duration_ms = clip.duration_ms
+        key = (self.audio_files[self.current_index], file_path)
+        streamed = isinstance(self.audio_clip, WavStream) or isinstance(self.reference_audio_clip, WavStream)
+        if key not in self.alignments and not streamed:
+            self.alignments[key] = None
+            self.analysis_pool.submit(self.align_clips, key, self.audio_clip, self.reference_audio_clip)
+
+    def align_clips(self, key, clip, reference_clip):
+        """runs on the analysis pool, a dict assignment is enough to publish the result
+        """
+        try:
+            self.alignments[key] = estimate_offset_ms(clip, reference_clip)
+        except (ValueError, MemoryError) as e:
+            print(f"Alignment of '{os.path.basename(key[0])}' failed: {e}")
+
+    def render_thumbnail(self, file_path, clip):
+        """runs on the thumbnail pool, skipped if the user already moved on to another clip
+        """
+        if self.audio_clip is not clip:
+            return
+        try:
+            with self.metrics.span('thumbnail'):
+                thumbnail = self.thumbnails.render(file_path, clip)
+        except (OSError, ValueError, MemoryError) as e:
+            print(f"Thumbnail of '{os.path.basename(file_path)}' failed: {e}")
+            return
+        self.thumbnail_ready.emit(file_path, thumbnail)
+
+    def on_thumbnail_ready(self, file_path, thumbnail):
+        if self.audio_files and self.audio_files[self.current_index] == file_path:
+            self.waveform_strip.set_thumbnail(thumbnail)
+
     def load_reference_audio(self, file_path):
-        # Load the audio file using wave
-        self.reference_audio_read = wave.open(file_path, 'rb')
-        self.reference_audio_data = self.reference_audio_read.readframes(self.reference_audio_read.getnframes())
-        self.reference_audio_num_channels = self.reference_audio_read.getnchannels()
-        self.reference_audio_bytes_per_sample = self.reference_audio_read.getsampwidth()
-        self.reference_audio_sample_rate = self.reference_audio_read.getframerate()
-        self.reference_audio_num_frames = self.reference_audio_read.getnframes()
-        self.reference_audio_duration_ms = self.reference_audio_num_frames / self.reference_audio_sample_rate * 1000
+        self.set_reference_clip(file_path)
         self.progress_slider.setRange(0, int(self.reference_audio_duration_ms))
         
         if self.reference_audio_data is None:
@@ -462,12 +963,47 @@ class PyqtEvaluationTool(QMainWindow):
             return
         else:
             self.play_reference_audio(0)
+
+    def toggle_ab(self):
+        """switch between test and reference audio, continuing at the matching position
+
+        Uses the cross-correlation offset when the background alignment found one,
+        the same relative position otherwise.
+        """
+        if self.audio_clip is None or self.reference_audio_clip is None:
+            print("No reference audio for this file.")
+            return
+        playing = self.play_obj is not None and self.play_obj.is_playing()
+        position = self.playback_position_ms() if playing else self.progress_slider.value()
+        offset = self.alignments.get((self.audio_files[self.current_index], self.reference_audio_path))
+        test_ms, reference_ms = self.audio_duration_ms, self.reference_audio_duration_ms
+        if self.playing_reference:
+            target = position + offset if offset is not None else position / max(reference_ms, 1) * test_ms
+            self.progress_slider.setRange(0, int(test_ms))
+            self.play_audio(min(max(target, 0), test_ms))
+        else:
+            target = position - offset if offset is not None else position / max(test_ms, 1) * reference_ms
+            self.progress_slider.setRange(0, int(reference_ms))
+            self.play_reference_audio(min(max(target, 0), reference_ms))
+
+    def prefetch_upcoming(self):
+        """decode the reference of the current clip and the next prefetch_num clips (with references) in the background
+        """
+        paths = []
+        if 0 <= self.current_index < len(self.reference_audio_files):
+            paths.append(self.reference_audio_files[self.current_index])
+        for index in range(self.current_index + 1, self.current_index + 1 + self.prefetch_num):
+            if index < len(self.audio_files):
+                paths.append(self.audio_files[index])
+            if index < len(self.reference_audio_files):
+                paths.append(self.reference_audio_files[index])     # None when there is no reference
+        self.prefetcher.prefetch(paths)
     
     def play_audio(self, start_ms=0):
         """play audio function
         """
         # Stop all current playback
-        sa.stop_all()
+        self.stop_playback()
         
         if self.audio_data is None:
             print("audio not loaded.")
@@ -475,19 +1011,16 @@ class PyqtEvaluationTool(QMainWindow):
         
         if self.current_index < len(self.audio_files):
             audio_file = self.audio_files[self.current_index]
-            self.text = self.get_text_ultimate()
+            with self.metrics.span('text_lookup'):
+                self.text = self.get_text_ultimate()
             
             display_text = f"{os.path.basename(audio_file)} \n{self.text}"
-            print(display_text)  # Debug statement
             self.text_display.setText(display_text)
             
-            # Play the audio from start_ms, using wave
-            start_frame = int(start_ms * self.sample_rate / 1000)
-            self.audio_read.setpos(start_frame)
-            audio_data = self.audio_read.readframes(self.num_frames - start_frame)
-            self.play_obj = sa.play_buffer(audio_data, self.num_channels, self.bytes_per_sample, self.sample_rate)
-            self.audio_position = start_ms
-            self.timer.start()
+            # Play the audio from start_ms, as a frame-aligned view of the loaded buffer
+            self.play_obj = self.start_playback(self.audio_clip, start_ms)
+            self.playing_reference = False
+            self.start_playback_clock(start_ms, self.audio_duration_ms)
 
         else:
             print("no more audio files.")
@@ -496,40 +1029,70 @@ class PyqtEvaluationTool(QMainWindow):
         """play reference audio function
         """
         # Stop all current playback
-        sa.stop_all()
+        self.stop_playback()
         
         if self.reference_audio_data is None:
             print("reference audio not loaded.")
             return
         
         if self.current_index < len(self.reference_audio_files):
-            audio_file = self.reference_audio_files[self.current_index]
-            display_text = f"{os.path.basename(audio_file)}"
-            print(display_text)  # Debug statement
-        
-            # Play the audio from start_ms, using wave
-            start_frame = int(start_ms * self.reference_audio_sample_rate / 1000)
-            self.reference_audio_read.setpos(start_frame)
-            audio_data = self.reference_audio_read.readframes(self.reference_audio_num_frames - start_frame)
-            self.play_obj = sa.play_buffer(audio_data, self.reference_audio_num_channels, self.reference_audio_bytes_per_sample, self.reference_audio_sample_rate)
-            self.audio_position = start_ms
-            self.timer.start()
+            # Play the audio from start_ms, as a frame-aligned view of the loaded buffer
+            self.play_obj = self.start_playback(self.reference_audio_clip, start_ms)
+            self.playing_reference = True
+            self.start_playback_clock(start_ms, self.reference_audio_duration_ms)
         else:
             print("no more audio files.")
     
+    def start_playback(self, clip, start_ms):
+        """play clip from start_ms, long recordings are streamed in chunks of stream_chunk_ms
+        """
+        with self.metrics.span('playback_start'):
+            return self._start_playback(clip, start_ms)
+
+    def _start_playback(self, clip, start_ms):
+        if isinstance(clip, WavStream):
+            return StreamPlayer(clip, self.audio_backend.play_buffer, start_ms, self.stream_chunk_ms).start()
+        return self.audio_backend.play_buffer(clip.buffer_from(start_ms), clip.num_channels, clip.bytes_per_sample, clip.sample_rate)
+
+    def stop_playback(self):
+        if self.play_obj is not None:
+            self.play_obj.stop()
+        self.audio_backend.stop_all()
+
+    def start_playback_clock(self, start_ms, duration_ms):
+        """anchor the slider position to a monotonic clock at the moment playback starts
+        """
+        self.playback_start_ms = start_ms
+        self.playback_started_at = time.monotonic()
+        self.playback_duration_ms = duration_ms
+        self.audio_position = start_ms
+        self.start_slider_timer()
+
+    def start_slider_timer(self):
+        if self.isVisible() and not self.isMinimized() and self.play_obj is not None and self.play_obj.is_playing():
+            self.timer.start()
+
+    def playback_position_ms(self):
+        elapsed_ms = (time.monotonic() - self.playback_started_at) * 1000
+        return min(self.playback_start_ms + elapsed_ms, self.playback_duration_ms)
+
     def update_slider(self):
-        """update the slider position per 10ms
+        """move the slider to the elapsed playback time, and stop refreshing once playback ends
         """
-        if self.play_obj.is_playing():
-            self.audio_position += 10
-            if self.audio_position > self.audio_duration_ms:
-                self.timer.stop()
-                return
-            self.progress_slider.setValue(self.audio_position)
+        self.audio_position = self.playback_position_ms()
+        self.progress_slider.setValue(int(self.audio_position))
+        # the strip shows the test clip, so no playhead while the reference plays
+        self.waveform_strip.set_position(None if self.playing_reference or not self.audio_duration_ms
+                                         else min(self.audio_position / self.audio_duration_ms, 1.0))
+        if self.play_obj is None or not self.play_obj.is_playing():
+            self.timer.stop()
             
     def seek_audio(self):
-        """play audio from the seek time
+        """play audio (or the reference, if that is what is playing) from the seek time
         """
+        if self.playing_reference and self.reference_audio_clip is not None:
+            self.play_reference_audio(self.progress_slider.value())
+            return
         self.progress_slider.setRange(0, int(self.audio_duration_ms))
         seek_time = self.progress_slider.value()
         start_ms = seek_time
@@ -538,146 +1101,186 @@ class PyqtEvaluationTool(QMainWindow):
     def next_audio(self):
         """button for next audio
         """
-        self.current_index += 1
+        previous_index = self.current_index
+        self.current_index = self.next_index(self.current_index + 1)
         if self.current_index < len(self.audio_files):
-            if self.current_index < len(self.texts):
+            if self.work_client is not None or self.has_text_slot(self.current_index):
                 self.load_audio(self.audio_files[self.current_index])
             else:
                 print("Text lines less than audio files.")
-                self.current_index -= 1
+                self.current_index = previous_index
         else:
-            print("no more audio files.") 
-            self.current_index -= 1
+            self.report_end_of_list()
+            self.current_index = previous_index
+
+    def has_text_slot(self, index):
+        """whether the text file reaches the clip at index: texts joined by name always do, texts paired
+        by order only while there are lines (or blocks) left for its position
+        """
+        if self.text_index is None:
+            return False
+        if not self.manifest.text_paired_by_order:
+            return True
+        return self.manifest.text_position(index) < len(self.text_index)
 
     def mark_result(self, result):
         """mark the result, if input two lines, the first line is the wrong word, the second line is the note. 
         If only one line, it is the note by default
         """
         if self.audio_files and 0 <= self.current_index < len(self.audio_files):
+            if self.clip_shown_at is not None:
+                # annotator time: from the clip being shown to the verdict
+                self.metrics.record('verdict', time.perf_counter() - self.clip_shown_at)
             current_audio = self.audio_files[self.current_index]
-            note_content = self.note.toPlainText()
-            # wrong_word = note_content.split('\n')[0] if '\n' in note_content else ''
-            error_word = note_content.split('\n')[0] if '\n' in note_content else ''
-            error_note = note_content.split('\n')[1] if '\n' in note_content else note_content
-            self.results.append({
-                'file': os.path.basename(current_audio), 
-                'text': self.text,
-                'result': result,
-                'error_word': error_word,
-                'note': error_note
-            })
+            note_lines = self.note.toPlainText().split('\n')
+            error_word, error_note = (note_lines[0], note_lines[1]) if len(note_lines) > 1 else ('', note_lines[0])
+            # rating the clip again before the save overwrites its pending verdict
+            self.results.set(self.current_index, result, error_word, error_note, round(time.time(), 3))
+            self.stats.add({'file': os.path.basename(current_audio), 'result': result})
+            self.file_model.refresh_row(self.current_index)
+            if len(self.results) >= self.autosave_every:
+                self.save_progress()
         else:
             print("No audio files or index out of range")
             return
-        self.current_index += 1
+        previous_index = self.current_index
+        self.current_index = self.next_index(self.current_index + 1)
         if self.current_index < len(self.audio_files):
             audio_file = self.audio_files[self.current_index]
             self.load_audio(audio_file)
         else:
-            print("no more audio files.") 
-            self.current_index -= 1
+            self.report_end_of_list()
+            self.current_index = previous_index
 
     def replay_audio(self):
         self.progress_slider.setRange(0, int(self.audio_duration_ms))
         self.play_audio()
 
+    def results_journal(self):
+        """journal that every save appends to, created on first use for the current audio folder
+        """
+        if self.journal is None:
+            self.journal = ResultsJournal.for_folder(args.audio_folder, self.shard)
+        return self.journal
+
+    def results_progress(self):
+        """progress index that every save appends to, created on first use for the current audio folder
+        """
+        if self.progress_index is None:
+            self.progress_index = ProgressIndex.for_folder(args.audio_folder, self.results_journal(), self.shard)
+        return self.progress_index
+
     def save_and_summary(self):
-        """save the results to a text file and an excel file, and calculate the statistics
-        """
-        folder = args.audio_folder
-        folder_name = os.path.basename(folder)
-        # add statistics to the text file
-        with open(f"results_{folder_name}.txt", "a", encoding='utf-8') as file:
-            for result in self.results:
-                file.write(f"{result['file']}:{result['result']}\t{result['error_word']}\t{result['note']}\n{result['text']}\n\n")
-        with open(f"results_{folder_name}.txt", "r", encoding='utf-8') as file:
-            tp_count, tn_count, fp_count, fn_count, good_count, bad_count = 0, 0, 0, 0, 0, 0
-            for line in file:
-                if line.startswith('o') and 'TP\t' in line:
-                    tp_count += 1
-                elif line.startswith('o') and 'TN\t' in line:
-                    tn_count += 1
-                elif line.startswith('o') and 'FP\t' in line:
-                    fp_count += 1
-                elif line.startswith('o') and 'FN\t' in line:
-                    fn_count += 1
-                elif line.startswith('o') and 'T\t' in line:
-                    good_count += 1
-                elif line.startswith('o') and 'F\t' in line:
-                    bad_count += 1
-        recall = tp_count / (tp_count + fn_count) * 100 if (tp_count + fn_count) > 0 else 0
-        recall = round(recall, 1)
-        precision = tp_count / (tp_count + fp_count) * 100 if (tp_count + fp_count) > 0 else 0
-        precision = round(precision, 1)
-        with open(f"results_{folder_name}.txt", "a", encoding='utf-8') as file:
-            file.write(f"\nTruePositive: {tp_count}\nTrueNegative: {tn_count}\nFalsePositive: {fp_count}\nFalseNegative: {fn_count}\n")
-            file.write(f"Recall: (TP/(TP + FN))\t{recall}%\nPrecision: (TP/(TP + FP))\t{precision}%\n")
-            file.write(f"Good: {good_count}\nBad: {bad_count}\n")
-
-        # save results to excel file
-        import pandas as pd
-        if not os.path.exists(f"results_{folder_name}.xlsx"):
-            with pd.ExcelWriter(f"results_{folder_name}.xlsx", mode='w') as writer:
-                df = pd.DataFrame(columns=['file', 'text', 'result', 'error_word', 'note'])
-                df.to_excel(writer, index=False, sheet_name='Results')   
-        with pd.ExcelWriter(f"results_{folder_name}.xlsx", mode='a', if_sheet_exists='overlay') as writer:
-            if os.path.exists(f"results_{folder_name}.xlsx"):
-                existing_df = pd.read_excel(f"results_{folder_name}.xlsx", sheet_name='Results')
-                df = pd.concat([existing_df, pd.DataFrame(self.results)], ignore_index=True)
-            else:
-                df = pd.DataFrame(self.results)
-            df.to_excel(writer, index=False, sheet_name='Results')
-            # add statistics
-            stats_df = pd.DataFrame({
-                'Metric': ['TruePositive', 'TrueNegative', 'FalsePositive', 'FalseNegative', 'Recall', 'Precision'],
-                'Value': [tp_count, tn_count, fp_count, fn_count, recall, precision]
-            })
-            stats_df.to_excel(writer, index=False, sheet_name='Statistics')
-        print("done")        
-        print(f"TruePositive: {tp_count}\nTrueNegative: {tn_count}\nFalsePositive: {fp_count}\nFalseNegative: {fn_count}")
-        print(f"Recall: {recall}%\nPrecision: {precision}%")
-        print(f"Good: {good_count}\nBad: {bad_count}")
-        self.results = []
-        
+        """save the results, then export the text file and the excel file from the journal and report the
+        statistics on the writer thread
+        """
+        with self.metrics.span('summary'):
+            self.save_progress()
+            if self.work_client is not None:
+                # the server has everyone's verdicts, report the shared totals
+                self.results_writer.submit(self.report_server_status).add_done_callback(self.report_summary_error)
+                return
+            # clips with the same audio as clips rated before count with their inherited verdict
+            inherited = [record for file, record in self.inherited.items() if file not in self.stats.verdicts]
+            stats = ResultStats.from_verdicts(dict({record['file']: record['result'] for record in inherited},
+                                                   **self.stats.verdicts)) if inherited else self.stats
+            future = self.results_writer.submit(self.export_reports, args.audio_folder, stats.summary(), inherited)
+            future.add_done_callback(self.report_summary_error)
+
+    def report_summary_error(self, future):
+        """done-callback of the summary on the writer thread, whose errors would otherwise stay in the future
+        """
+        if future.exception() is not None:
+            print(f"Summary failed: {future.exception()!r}")
+
+    def export_reports(self, folder, summary, inherited):
+        """runs on the writer thread, after every queued save
+        """
+        with self.metrics.span('summary_export'):
+            journal = self.results_journal()
+            records = journal.read_all()
+            summary_lines = format_summary(summary)
+            if inherited:
+                summary_lines.append(f"Inherited from identical audio rated before: {len(inherited)}\n")
+            sheets = {
+                'ByPrefix': metrics_table(inherited + records, by='prefix'),
+                'BySpeaker': metrics_table(inherited + records, by='speaker'),
+            }
+            if inherited:
+                import pandas as pd
+                sheets['Inherited'] = pd.DataFrame(inherited, columns=RESULT_COLUMNS + ['inherited_from'])
+            # export both reports in one pass over the journal
+            try:
+                journal.export_txt(results_path(folder, 'txt', self.shard), records, summary_lines)
+                journal.export_xlsx(results_path(folder, 'xlsx', self.shard), records, stats={
+                    'TruePositive': summary['TP'], 'TrueNegative': summary['TN'], 'FalsePositive': summary['FP'],
+                    'FalseNegative': summary['FN'], 'Recall': summary['Recall'], 'Precision': summary['Precision'],
+                    'F1': summary['F1'], 'Good': summary['T'], 'Bad': summary['F'], 'GoodRate': summary['GoodRate'],
+                }, sheets=sheets)
+            except Exception as e:      # e.g. characters openpyxl cannot store, the journal has everything
+                print(f"Exporting the reports failed, the results are safe in '{journal.path}': {e!r}")
+                return
+            if self.columnar != 'off':
+                try:
+                    export_columnar(results_path(folder, self.columnar, self.shard), run_name(folder, self.shard),
+                                    records, inherited)
+                except ImportError:
+                    print("pyarrow is not installed, the results are not exported as columnar files.")
+                    self.columnar = 'off'
+                except OSError as e:
+                    print(f"Exporting the columnar results failed: {e}")
+        print("done")
+        print(''.join(summary_lines).strip())
+
     def save_progress(self):
-        """save current progress
-        """
-        folder = args.audio_folder
-        folder_name = os.path.basename(folder)
-        # save results to text file
-        with open(f"results_{folder_name}.txt", "a", encoding='utf-8') as file:
-            for result in self.results:
-                file.write(f"{result['file']}:{result['result']}\t{result['error_word']}\t{result['note']}\n{result['text']}\n\n")
-                
-        # save results to excel file
-        import pandas as pd
-        if not os.path.exists(f"results_{folder_name}.xlsx"):
-            with pd.ExcelWriter(f"results_{folder_name}.xlsx", mode='w') as writer:
-                df = pd.DataFrame(columns=['file', 'text', 'result', 'error_word', 'note'])
-                df.to_excel(writer, index=False, sheet_name='Results')
-        with pd.ExcelWriter(f"results_{folder_name}.xlsx", mode='a', if_sheet_exists='overlay') as writer:
-            if os.path.exists(f"results_{folder_name}.xlsx"):
-                existing_df = pd.read_excel(f"results_{folder_name}.xlsx", sheet_name='Results')
-                df = pd.concat([existing_df, pd.DataFrame(self.results)], ignore_index=True)
-            else:
-                df = pd.DataFrame(self.results)
-            df.to_excel(writer, index=False, sheet_name='Results')
-        
-        self.results = []
+        """queue the new results for the writer thread, which appends them to the journal
+        """
+        with self.metrics.span('save'):
+            self.results_writer.save([self.result_record(index, verdict) for index, verdict in self.results.take()])
+
+    def result_record(self, index, verdict):
+        """the saved record of the pending verdict of clip index, with the clip's text looked up again
+        """
+        return {
+            'file': os.path.basename(self.audio_files[index]),
+            'text': self.get_text_ultimate(index),
+            'result': verdict.result,
+            'error_word': verdict.error_word,
+            'note': verdict.note,
+            'session': self.session,
+            'rated_at': verdict.rated_at,
+        }
+
+    def report_server_status(self):
+        status = self.work_client.request({'op': 'status'})
+        summary = status.pop('summary')
+        print(f"Work server: {status['done']} of {status['clips']} clips done, {status['leased']} leased.")
+        print(', '.join(f"{name}: {summary[name]}" for name in ('TP', 'TN', 'FP', 'FN', 'Recall', 'Precision',
+                                                                 'F1', 'T', 'F', 'GoodRate')))
 
-    def on_item_clicked(self, item):
+    def write_records(self, records):
+        """runs on the writer thread: journal first, then the progress and content indexes
+        (or the work server, which keeps the shared journal)
+        """
+        if self.work_client is not None:
+            leases = [self.remote_leases[record['file']] for record in records if record['file'] in self.remote_leases]
+            self.work_client.send_verdicts(records, leases)
+            self.lease_prefetcher.complete(leases)
+            return
+        self.results_journal().append(records)
+        self.results_progress().append(records)
+        self.remember_verdicts(records)
+
+    def on_item_clicked(self, index):
         """handle audio list click event
         """
         self.progress_slider.setRange(0, int(self.audio_duration_ms))
-        filename = item.text()
-        for file in self.audio_files:
-            if os.path.basename(file) == filename:
-                # jump to the selected audio file
-                self.current_index = self.audio_files.index(file)
-                self.load_audio(file)
-                break
+        if 0 <= index.row() < len(self.audio_files):
+            # jump to the selected audio file
+            self.current_index = index.row()
+            self.load_audio(self.audio_files[self.current_index])
         else:
-            print(f"File '{filename}' not found in audio files.")
+            print(f"Row {index.row()} not found in audio files.")
             
     def switch_layout(self):
         """switch the layout between two button layouts and four button layouts
@@ -700,10 +1303,28 @@ class PyqtEvaluationTool(QMainWindow):
 
 def main():
     app = QApplication(sys.argv)
-    window = PyqtEvaluationTool()
-    window.load_files(args.audio_folder, args.text_file, args.reference_audio_folder)    
+    work_client = None
+    if args.server:
+        from work_queue import WorkClient
+        try:
+            work_client = WorkClient(args.server, args.annotator)
+        except OSError as e:
+            print(f"Cannot reach the work server at {args.server}: {e}")
+            sys.exit(1)
+    window = PyqtEvaluationTool(prefetch_num=args.prefetch_num, cache_mb=args.cache_mb, stream_mb=args.stream_mb,
+                                audio_backend=create_backend(args.audio_backend), metrics_out=args.metrics_out,
+                                thumbnail_dir=args.thumbnail_dir, prescreen_process_num=args.prescreen_process_num,
+                                content_index_path=args.content_index, duplicates=args.duplicates,
+                                autosave_every=args.autosave_every, autosave_s=args.autosave_s,
+                                work_client=work_client, shard=args.shard, annotator=args.annotator,
+                                columnar=args.columnar)
+    # show the window first, the corpus then loads in the background
     window.show()
     window.switch_layout()
+    if work_client is not None:
+        QTimer.singleShot(0, window.load_remote)
+    else:
+        QTimer.singleShot(0, lambda: window.load_files(args.audio_folder, args.text_file, args.reference_audio_folder))
     sys.exit(app.exec_())
 
 
@@ -711,10 +1332,45 @@ def main():
 
 if __name__ == "__main__":
     parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
-    parser.add_argument('--result_folder', type=str)
-    parser.add_argument('--process_num', type=int, default=1)
+    parser.add_argument('--result_folder', type=str, help='summarize every results_* file in this folder instead of opening the window')
+    parser.add_argument('--process_num', type=int, default=1, help='processes used to parse result files with --result_folder')
+    parser.add_argument('--prefetch_num', type=int, default=4, help='number of upcoming clips decoded in the background')
+    parser.add_argument('--cache_mb', type=int, default=256, help='memory budget of the decoded audio cache')
+    parser.add_argument('--stream_mb', type=int, default=64, help='wav files above this size are streamed instead of decoded')
+    parser.add_argument('--audio_backend', type=str, default='simpleaudio', choices=sorted(BACKENDS),
+                        help="'null' plays nothing, for machines without a sound device")
+    parser.add_argument('--metrics_out', type=str, default=None,
+                        help='write timing metrics here when the window closes, Prometheus text for .prom, JSON otherwise')
+    parser.add_argument('--thumbnail_dir', type=str, default=DEFAULT_CACHE_DIR,
+                        help='on-disk cache of the waveform/spectrogram strips')
+    parser.add_argument('--prescreen_process_num', type=int, default=1,
+                        help='processes used to pre-screen new clips for silence, clipping and truncation, 0 turns it off')
+    parser.add_argument('--content_index', type=str, default=DEFAULT_INDEX_PATH,
+                        help='verdicts by audio content, shared by every folder and session')
+    parser.add_argument('--duplicates', type=str, default='prefill', choices=['prefill', 'hide', 'off'],
+                        help="clips identical to clips rated before: 'prefill' shows the earlier verdict, 'hide' also skips them")
+    parser.add_argument('--autosave_every', type=int, default=20, help='save after this many new verdicts')
+    parser.add_argument('--autosave_s', type=float, default=30, help='save new verdicts at least this often')
+    parser.add_argument('--serve', type=str, default=None,
+                        help='host:port, share the folders below with other annotators instead of opening the window')
+    parser.add_argument('--server', type=str, default=None, help='host:port of a work server to take clips from')
+    parser.add_argument('--annotator', type=str, default=os.environ.get('USER', os.environ.get('USERNAME', 'anonymous')),
+                        help='name the work server knows this window by, also saved with every verdict')
+    parser.add_argument('--merge', type=str, nargs='+', default=None,
+                        help='merge these shard result files into one result set and summary instead of opening the window')
+    parser.add_argument('--columnar', type=str, default='parquet', choices=['parquet', 'arrow', 'off'],
+                        help='also export the results as results_<folder>.parquet/.arrow with the summary (needs pyarrow)')
+    parser.add_argument('--shard', type=parse_shard, default=None,
+                        help="i/N: evaluate only shard i (1..N) of the folder, split by a hash of the file names")
     args = parser.parse_args()
     
+    if args.result_folder:
+        import batch_summary
+        sys.exit(batch_summary.main(['--result_folder', args.result_folder, '--process_num', str(args.process_num)]))
+    if args.merge:
+        import merge_results
+        sys.exit(merge_results.main(args.merge))
+    
     # change for the test data
     args.audio_folder = R"audio_folder"     # Your_audio_folder
     
@@ -722,5 +1378,9 @@ if __name__ == "__main__":
     
     args.text_file = R"test.txt"
     
+    if args.serve:
+        import work_queue
+        sys.exit(work_queue.main(['--audio_folder', args.audio_folder, '--text_file', args.text_file,
+                                  '--reference_audio_folder', args.reference_audio_folder, '--listen', args.serve]))
     
     main()
\ No newline at end of file
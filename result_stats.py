@@ -0,0 +1,139 @@
+import os
+import re
+from collections import Counter
+
+from results_journal import VERDICTS
+
+
+def file_prefix(filename):
+    """leading non-digit part of the file name, 'o123.wav' -> 'o'
+    """
+    return re.match(r'\D*', os.path.splitext(os.path.basename(filename))[0]).group() or '(none)'
+
+
+def file_speaker(filename):
+    """first '_'-separated field of the file name, 'spk01_0003.wav' -> 'spk01'
+    """
+    return os.path.splitext(os.path.basename(filename))[0].split('_')[0]
+
+
+GROUPINGS = {'prefix': file_prefix, 'speaker': file_speaker}
+
+
+def _wilson(successes, total, z):
+    """Wilson score interval (in %), operators only so it works on floats and numpy arrays alike
+    """
+    p = successes / total
+    centre = p + z * z / (2 * total)
+    margin = z * (p * (1 - p) / total + z * z / (4 * total * total)) ** 0.5
+    scale = 1 + z * z / total
+    return (centre - margin) / scale * 100, (centre + margin) / scale * 100
+
+
+def wilson_interval(successes, total, z=1.96):
+    """95% confidence interval of successes/total in %, (0, 0) when there is nothing to count
+    """
+    if total == 0:
+        return 0.0, 0.0
+    low, high = _wilson(successes, total, z)
+    return round(low, 1), round(high, 1)
+
+
+def compute_metrics(counts):
+    """recall, precision, F1 (on TP/FP/FN) and the good rate (on T/F), all in %, with confidence intervals
+    """
+    tp, fp, fn = counts['TP'], counts['FP'], counts['FN']
+    good, bad = counts['T'], counts['F']
+    recall = tp / (tp + fn) * 100 if (tp + fn) > 0 else 0.0
+    precision = tp / (tp + fp) * 100 if (tp + fp) > 0 else 0.0
+    f1 = 2 * recall * precision / (recall + precision) if (recall + precision) > 0 else 0.0
+    good_rate = good / (good + bad) * 100 if (good + bad) > 0 else 0.0
+    return {
+        'Recall': round(recall, 1),
+        'Recall_CI95': wilson_interval(tp, tp + fn),
+        'Precision': round(precision, 1),
+        'Precision_CI95': wilson_interval(tp, tp + fp),
+        'F1': round(f1, 1),
+        'GoodRate': round(good_rate, 1),
+        'GoodRate_CI95': wilson_interval(good, good + bad),
+    }
+
+
+def format_summary(summary):
+    """lines of the text report's summary block, from ResultStats.summary()
+    """
+    return [
+        f"\nTruePositive: {summary['TP']}\nTrueNegative: {summary['TN']}\nFalsePositive: {summary['FP']}\nFalseNegative: {summary['FN']}\n",
+        f"Recall: (TP/(TP + FN))\t{summary['Recall']}%\t95% CI {summary['Recall_CI95']}\n",
+        f"Precision: (TP/(TP + FP))\t{summary['Precision']}%\t95% CI {summary['Precision_CI95']}\n",
+        f"F1: \t{summary['F1']}%\n",
+        f"Good: {summary['T']}\nBad: {summary['F']}\n",
+        f"GoodRate: (Good/(Good + Bad))\t{summary['GoodRate']}%\t95% CI {summary['GoodRate_CI95']}\n",
+    ]
+
+
+def metrics_table(records, by='prefix'):
+    """per-group verdict counts and metrics as a DataFrame, computed with one group-by
+
+    records is an iterable of result dicts (or a DataFrame); only the latest verdict of each file counts.
+    """
+    import numpy as np
+    import pandas as pd
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(list(records), columns=['file', 'result'])
+    df = df.drop_duplicates('file', keep='last')
+    keys = df['file'].map(GROUPINGS[by]).rename(by)
+    table = pd.crosstab(keys, df['result']).reindex(columns=list(VERDICTS), fill_value=0)
+    table.columns.name = None
+    tp, fp, fn = table['TP'].to_numpy(float), table['FP'].to_numpy(float), table['FN'].to_numpy(float)
+    good, bad = table['T'].to_numpy(float), table['F'].to_numpy(float)
+
+    def ratio(successes, total):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            value = np.where(total > 0, successes / total * 100, 0.0)
+            low, high = _wilson(successes, np.where(total > 0, total, np.nan), 1.96)
+        return value, np.nan_to_num(low), np.nan_to_num(high)
+
+    table['Total'] = table[list(VERDICTS)].sum(axis=1)
+    table['Recall'], table['Recall_low'], table['Recall_high'] = ratio(tp, tp + fn)
+    table['Precision'], table['Precision_low'], table['Precision_high'] = ratio(tp, tp + fp)
+    recall, precision = table['Recall'].to_numpy(), table['Precision'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['F1'] = np.where(recall + precision > 0, 2 * recall * precision / (recall + precision), 0.0)
+    table['GoodRate'], table['GoodRate_low'], table['GoodRate_high'] = ratio(good, good + bad)
+    return table.round(1).reset_index()
+
+
+class ResultStats:
+    """running verdict counters, per file prefix / speaker tables are built by metrics_table
+
+    Only the latest verdict of each file counts, so re-rating a clip replaces its old verdict.
+    """
+    def __init__(self):
+        self.verdicts = {}      # file -> latest result
+        self.counts = Counter()
+
+    @classmethod
+    def from_verdicts(cls, verdicts):
+        """counters of a file -> latest result dict
+        """
+        stats = cls()
+        stats.verdicts = dict(verdicts)
+        stats.counts.update(stats.verdicts.values())
+        return stats
+
+    def add(self, record):
+        """count one new verdict, replacing the previous verdict of the same file if there is one
+        """
+        file, result = record['file'], record['result']
+        previous = self.verdicts.get(file)
+        if previous is not None:
+            self.counts[previous] -= 1
+        self.verdicts[file] = result
+        self.counts[result] += 1
+
+    def summary(self):
+        """verdict counts and metrics of everything counted so far
+        """
+        summary = {verdict: self.counts[verdict] for verdict in VERDICTS}
+        summary.update(compute_metrics(self.counts))
+        return summary
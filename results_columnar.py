@@ -0,0 +1,151 @@
+"""Columnar (Parquet / Arrow IPC) copies of evaluation results, and summaries computed from them.
+
+    python results_columnar.py runs/*.parquet --by run --output summary.csv
+
+Every results_<folder>.parquet holds one row per saved verdict with the run name, the annotation
+session and the time it was given; text and result are dictionary-encoded, so a long script costs
+one copy per distinct text rather than one per row. Only the columns a summary needs are read.
+"""
+import os
+import sys
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+
+from batch_summary import summary_row, write_table
+from result_stats import GROUPINGS
+from results_journal import RESULT_COLUMNS, VERDICTS
+
+
+GROUP_COLUMNS = ('run', 'session', 'prefix', 'speaker')
+
+
+def result_schema():
+    """Arrow schema of the exported results, built on demand so importing this module does not need pyarrow
+    """
+    import pyarrow as pa
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('run', dictionary),
+        ('session', dictionary),
+        ('file', pa.string()),
+        ('text', dictionary),
+        ('result', dictionary),
+        ('error_word', pa.string()),
+        ('note', pa.string()),
+        ('rated_at', pa.timestamp('ms', tz='UTC')),
+        ('inherited_from', pa.string()),
+    ])
+
+
+def results_table(run, records, inherited=()):
+    """Arrow table of a run's records in journal order, preceded by inherited records
+
+    Inherited records (verdicts of identical audio rated elsewhere) come first, so a file's own
+    verdict wins when only the latest row of each file is counted.
+    """
+    import pyarrow as pa
+    schema = result_schema()
+    rows = list(inherited) + list(records)
+    columns = {
+        'run': [run] * len(rows),
+        'session': [record.get('session') or None for record in rows],
+        'rated_at': [None if record.get('rated_at') in (None, '') else int(float(record['rated_at']) * 1000)
+                     for record in rows],
+        'inherited_from': [record.get('inherited_from') for record in rows],
+    }
+    for column in RESULT_COLUMNS:
+        columns[column] = [record.get(column, '') for record in rows]
+    arrays = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(columns[field.name], pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(columns[field.name], field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def export_columnar(path, run, records, inherited=()):
+    """write the results as Parquet, or as an Arrow IPC file for .arrow paths, atomically
+    """
+    table = results_table(run, records, inherited)
+    temp_path = f"{path}.tmp"
+    if path.endswith('.arrow'):
+        import pyarrow.feather as feather
+        feather.write_feather(table, temp_path, compression='zstd')
+    else:
+        import pyarrow.parquet as pq
+        pq.write_table(table, temp_path, compression='zstd')
+    os.replace(temp_path, path)
+    return table.num_rows
+
+
+def read_columnar(paths, columns=None):
+    """one Arrow table of the rows of every Parquet / Arrow IPC file in paths, only the given columns
+    """
+    import pyarrow as pa
+    tables = []
+    for path in paths:
+        if path.endswith('.arrow'):
+            import pyarrow.feather as feather
+            tables.append(feather.read_table(path, columns=columns))
+        else:
+            import pyarrow.parquet as pq
+            tables.append(pq.read_table(path, columns=columns))
+    return pa.concat_tables(tables, promote_options='permissive') if len(tables) > 1 else tables[0]
+
+
+def latest_verdicts(paths, extra_columns=()):
+    """DataFrame of the latest verdict of each file of each run, rows in the order they were saved
+    """
+    table = read_columnar(paths, ['run', 'file', 'result'] + [column for column in extra_columns
+                                                              if column not in ('run', 'file', 'result')])
+    df = table.to_pandas()
+    df['result'] = df['result'].astype(str)
+    df = df[df['result'].isin(VERDICTS)]
+    return df.drop_duplicates(['run', 'file'], keep='last')
+
+
+def query_summary(paths, by='run'):
+    """summary rows (the counts and metrics of the summary report) per run, session, file prefix or speaker,
+    plus an 'ALL' row, computed from columnar result files
+    """
+    df = latest_verdicts(paths, ['session'] if by == 'session' else [])
+    keys = (df['file'].map(GROUPINGS[by]) if by in GROUPINGS else df[by].astype(object).fillna('(none)')).rename(by)
+    table = df.groupby([keys, df['result']]).size().unstack(fill_value=0)
+    table = table.reindex(columns=list(VERDICTS), fill_value=0)
+    groups = [(group, {verdict: int(table.at[group, verdict]) for verdict in VERDICTS}) for group in table.index]
+    groups.append(('ALL', {verdict: int(table[verdict].sum()) for verdict in VERDICTS}))
+    rows = []
+    for group, counts in groups:
+        row = summary_row(group, '', counts)
+        del row['run'], row['source']
+        rows.append(dict({by: group}, **row))
+    return rows
+
+
+def main(argv=None):
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter, description=__doc__.splitlines()[0])
+    parser.add_argument('result_files', nargs='+', help='results_<folder>.parquet / .arrow files')
+    parser.add_argument('--by', type=str, default='run', choices=GROUP_COLUMNS, help='one summary row per')
+    parser.add_argument('--output', type=str, default=None, help='write the rows to this CSV instead of printing them')
+    args = parser.parse_args(argv)
+
+    missing = [path for path in args.result_files if not os.path.isfile(path)]
+    if missing:
+        print(f"Result files not found: {', '.join(missing)}")
+        return 1
+    try:
+        rows = query_summary(args.result_files, args.by)
+    except ImportError:
+        print("Reading columnar results needs pyarrow: pip install pyarrow")
+        return 1
+    if args.output:
+        write_table(rows, args.output)
+        print(f"{len(rows) - 1} groups summarized into '{args.output}'.")
+    else:
+        for row in rows:
+            print(', '.join(f"{name}: {value}" for name, value in row.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import json
+import os
+import re
+
+from audio_archive import folder_name
+
+
+RESULT_COLUMNS = ['file', 'text', 'result', 'error_word', 'note']
+# kept in the journal when a record has them: annotation session and verdict time (unix seconds)
+SESSION_COLUMNS = ['session', 'rated_at']
+VERDICTS = ('TP', 'TN', 'FP', 'FN', 'T', 'F')
+
+# first line of a record in results_<folder>.txt: "<file>:<result>\t<error_word>\t<note>"
+_TXT_HEADER = re.compile(r'^(.+?):(TP|TN|FP|FN|T|F)\t([^\t]*)\t(.*)$')
+
+
+def run_name(folder, shard=None):
+    """name of the results of an audio folder (or archive), <folder name> or <folder name>_shard<i>of<N>
+    """
+    name = folder_name(folder)
+    if shard is not None:
+        name = f"{name}_shard{shard[0]}of{shard[1]}"
+    return name
+
+
+def results_path(folder, extension, shard=None):
+    """results_<folder name>.<extension>, next to the other result files in the working directory
+
+    Shard i of N is saved as results_<folder name>_shard<i>of<N>.<extension>.
+    """
+    return f"results_{run_name(folder, shard)}.{extension}"
+
+
+def format_txt_record(record):
+    return f"{record['file']}:{record['result']}\t{record['error_word']}\t{record['note']}\n{record['text']}\n\n"
+
+
+def parse_results_txt(txt_path):
+    """yield the records of a results_<folder>.txt report, summary blocks are skipped
+    """
+    record = None
+    with open(txt_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.rstrip('\n')
+            if record is None:
+                match = _TXT_HEADER.match(line)
+                if match:
+                    record = dict(zip(['file', 'result', 'error_word', 'note'], match.groups()))
+                    text_lines = []
+            elif line:
+                text_lines.append(line)
+            else:
+                record['text'] = '\n'.join(text_lines)
+                yield record
+                record = None
+    if record is not None:
+        record['text'] = '\n'.join(text_lines)
+        yield record
+
+
+class ResultsJournal:
+    """append-only JSON lines journal of evaluation results, one record per line
+
+    Saving only appends the new records; the .txt and .xlsx reports are exported from it on demand.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def for_folder(cls, folder, shard=None):
+        """journal of an audio folder (or a shard of it), seeded once from an existing results_<folder>.txt
+        """
+        journal = cls(results_path(folder, 'jsonl', shard))
+        txt_path = results_path(folder, 'txt', shard)
+        if not os.path.exists(journal.path) and os.path.exists(txt_path):
+            journal.append(parse_results_txt(txt_path))
+        return journal
+
+    def append(self, records):
+        """write records at the end of the journal, returns how many were written
+        """
+        lines = []
+        for record in records:
+            entry = {column: record.get(column, '') for column in RESULT_COLUMNS}
+            entry.update({column: record[column] for column in SESSION_COLUMNS if column in record})
+            lines.append(json.dumps(entry, ensure_ascii=False) + '\n')
+        if lines:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.writelines(lines)
+                file.flush()
+                os.fsync(file.fileno())
+        return len(lines)
+
+    def __iter__(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        print(f"Skipping broken line in '{self.path}'.")  # e.g. torn write after a crash
+
+    def read_all(self):
+        return list(self)
+
+    def export_txt(self, txt_path, records=None, summary_lines=()):
+        """rewrite the text report in a single pass
+        """
+        records = self if records is None else records
+        with open(txt_path, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(format_txt_record(record))
+            file.writelines(summary_lines)
+
+    def export_xlsx(self, xlsx_path, records=None, stats=None, sheets=None):
+        """rewrite the excel report in a single pass, stats is an optional {metric: value} sheet
+        and sheets optional extra {sheet name: DataFrame}
+        """
+        import pandas as pd
+        records = self.read_all() if records is None else records
+        with pd.ExcelWriter(xlsx_path, mode='w') as writer:
+            pd.DataFrame(records, columns=RESULT_COLUMNS).to_excel(writer, index=False, sheet_name='Results')
+            if stats is not None:
+                stats_df = pd.DataFrame({'Metric': list(stats.keys()), 'Value': list(stats.values())})
+                stats_df.to_excel(writer, index=False, sheet_name='Statistics')
+            for sheet_name, sheet_df in (sheets or {}).items():
+                sheet_df.to_excel(writer, index=False, sheet_name=sheet_name)
@@ -0,0 +1,83 @@
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+
+class ResultsWriter:
+    """a single thread that does every write of result files, fed through a queue
+
+    Record batches waiting in the queue are group-committed: the thread takes all of them at once
+    and hands them to write_records in one call, so a burst of saves costs one journal append.
+    Other jobs (e.g. report exports) run in order with the batches, their outcome is a Future.
+    """
+    def __init__(self, write_records, metrics=None):
+        self.write_records = write_records
+        self.metrics = metrics
+        self._queue = queue.Queue()
+        self._unwritten = []    # records whose write failed, retried with the next batch
+        self._thread = threading.Thread(target=self._run, name='results-writer', daemon=True)
+        self._thread.start()
+
+    def save(self, records):
+        """queue records for writing, returns immediately
+        """
+        if records:
+            self._queue.put(('records', list(records)))
+
+    def submit(self, function, *args):
+        """run function(*args) on the writer thread after everything queued before it
+        """
+        future = Future()
+        self._queue.put(('call', (function, args, future)))
+        return future
+
+    def flush(self, timeout=None):
+        """wait until everything queued so far is written, returns False on timeout
+        """
+        try:
+            self.submit(lambda: None).result(timeout)
+            return True
+        except TimeoutError:
+            return False
+
+    def close(self, timeout=None):
+        """write what is queued and stop the thread
+        """
+        self._queue.put(('stop', None))
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            kind, payload = self._queue.get()
+            batch = list(self._unwritten)
+            while kind == 'records':
+                batch.extend(payload)
+                try:
+                    kind, payload = self._queue.get_nowait()
+                except queue.Empty:
+                    kind, payload = None, None
+            if batch:
+                self._write(batch)
+            if kind == 'call':
+                function, args, future = payload
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(function(*args))
+                    except Exception as e:      # reported through the future
+                        future.set_exception(e)
+            elif kind == 'stop':
+                if self._unwritten:
+                    print(f"{len(self._unwritten)} results could not be saved.")
+                return
+
+    def _write(self, batch):
+        try:
+            if self.metrics is not None:
+                with self.metrics.span('save_write'):
+                    self.write_records(batch)
+            else:
+                self.write_records(batch)
+            self._unwritten = []
+        except Exception as e:      # the thread must outlive any failure, or every later save is lost
+            print(f"Saving {len(batch)} results failed, retrying with the next save: {e!r}")
+            self._unwritten = batch
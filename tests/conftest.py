@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules are top-level scripts next to pyqt_evaluation_tool.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,95 @@
+import io
+import os
+import tarfile
+import wave
+import zipfile
+
+import pytest
+
+import audio_archive
+from audio_archive import DEFLATED, STORED, TAR_STREAM, AudioArchive, folder_name, split_sequential
+from audio_cache import decode_wav
+
+
+def wav_bytes(value, frames=4000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(8000)
+        audio.writeframes(bytes([value, 0]) * frames)
+    return buffer.getvalue()
+
+
+# spk1/0001 and spk2/0001 share a file name in different folders
+MEMBERS = {'spk1/0001.wav': wav_bytes(1), 'spk2/0001.wav': wav_bytes(2), 'spk2/0002.wav': wav_bytes(3)}
+
+
+def write_archive(path):
+    name = str(path)
+    if name.endswith('.zip'):
+        with zipfile.ZipFile(name, 'w') as archive:
+            for index, (member, data) in enumerate(MEMBERS.items()):
+                # stored and deflated members side by side
+                archive.writestr(member, data, zipfile.ZIP_STORED if index % 2 else zipfile.ZIP_DEFLATED)
+    else:
+        with tarfile.open(name, 'w:gz' if name.endswith('.tar.gz') else 'w') as archive:
+            for member, data in MEMBERS.items():
+                info = tarfile.TarInfo(f'./{member}')
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+    return name
+
+
+@pytest.fixture
+def open_archive(tmp_path, monkeypatch):
+    """opens archives with their member index cached in tmp_path, not in ~/.cache
+    """
+    def open_(name):
+        path = write_archive(tmp_path / name)
+        archive = AudioArchive(path, cache_dir=str(tmp_path / 'cache'))
+        monkeypatch.setitem(audio_archive._archives, os.path.abspath(path), archive)
+        return archive
+    return open_
+
+
+@pytest.mark.parametrize('name', ['batch.zip', 'batch.tar', 'batch.tar.gz'])
+def test_members_decode_to_the_source_wav(open_archive, name):
+    archive = open_archive(name)
+    assert folder_name(archive.path) == 'batch'
+    assert sorted(archive.members) == sorted(MEMBERS)
+    for member, data in MEMBERS.items():
+        path = os.path.join(archive.path, member)
+        with wave.open(io.BytesIO(data)) as source:
+            assert decode_wav(path).data == source.readframes(source.getnframes())
+        assert bytes(archive.buffer(member)) == data
+        assert archive.stat(member).st_size == len(data)
+
+
+def test_member_methods(open_archive):
+    methods = {name: archive_member.method for name, archive_member in open_archive('batch.zip').members.items()}
+    assert methods == {'spk1/0001.wav': DEFLATED, 'spk2/0001.wav': STORED, 'spk2/0002.wav': DEFLATED}
+    assert {member.method for member in open_archive('batch.tar').members.values()} == {STORED}
+    assert {member.method for member in open_archive('batch.tar.gz').members.values()} == {TAR_STREAM}
+
+
+def test_cached_index_is_reused(open_archive, tmp_path, monkeypatch):
+    archive = open_archive('batch.zip')
+    monkeypatch.setattr(AudioArchive, '_build_index', lambda self: pytest.fail('index built again'))
+    assert AudioArchive(archive.path, cache_dir=str(tmp_path / 'cache')).members == archive.members
+
+
+def test_compressed_tar_members_are_read_in_archive_order(open_archive, tmp_path):
+    archive = open_archive('batch.tar.gz')
+    paths = [os.path.join(archive.path, member) for member in reversed(list(MEMBERS))]
+    sequential, other = split_sequential(paths + [str(tmp_path / 'plain.wav')])
+    assert sequential == paths[::-1]
+    assert other == [str(tmp_path / 'plain.wav')]
+
+
+def test_equal_file_names_are_reported_as_duplicates(open_archive):
+    from manifest import Manifest
+    manifest = Manifest(open_archive('batch.tar.gz').path)
+    assert [os.path.basename(path) for path in manifest.audio_files] == ['0001.wav', '0002.wav']
+    assert manifest.audio_files[0].endswith('spk1/0001.wav')
+    assert manifest.unmatched()['duplicate_name'] == ['spk2/0001.wav']
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from merge_results import merge_results, merged_name
+
+
+def write_shard(path, verdicts):
+    with open(path, 'w', encoding='utf-8') as file:
+        for filename, result in verdicts:
+            file.write(json.dumps({'file': filename, 'text': '', 'result': result, 'error_word': '', 'note': ''}) + '\n')
+    return str(path)
+
+
+def read_journal(path):
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+def test_stems_with_the_same_natural_key_stay_in_one_group(tmp_path):
+    # 'x01' and 'x1' sort alike by natural key, their records must not interleave
+    first = write_shard(tmp_path / 'results_a_shard1of2.jsonl', [('x01.wav', 'TP'), ('x1.wav', 'FN')])
+    second = write_shard(tmp_path / 'results_a_shard2of2.jsonl', [('x01.wav', 'FP'), ('x1.wav', 'FN')])
+    summary, conflicts = merge_results([first, second], str(tmp_path / 'merged'))
+
+    records = read_journal(tmp_path / 'merged.jsonl')
+    assert sorted(record['file'] for record in records) == ['x01.wav', 'x1.wav']
+    assert {record['file']: record['result'] for record in records} == {'x01.wav': 'TP', 'x1.wav': 'FN'}
+    assert conflicts == [('x01', {first: 'TP', second: 'FP'})]
+    assert (summary['TP'], summary['FP'], summary['FN']) == (1, 0, 1)
+
+
+def test_latest_verdict_of_each_shard_counts(tmp_path):
+    first = write_shard(tmp_path / 'results_a_shard1of2.jsonl', [('o2.wav', 'F'), ('o10.wav', 'T'), ('o2.wav', 'T')])
+    second = write_shard(tmp_path / 'results_a_shard2of2.jsonl', [('o3.wav', 'F')])
+    summary, conflicts = merge_results([first, second], str(tmp_path / 'merged'))
+
+    assert [record['file'] for record in read_journal(tmp_path / 'merged.jsonl')] == ['o2.wav', 'o3.wav', 'o10.wav']
+    assert conflicts == []
+    assert (summary['T'], summary['F']) == (2, 1)
+
+
+def test_existing_output_is_kept_without_force(tmp_path):
+    shard = write_shard(tmp_path / 'results_a_shard1of1.jsonl', [('o1.wav', 'TP')])
+    output = tmp_path / 'results_a_merged'
+    (tmp_path / 'results_a_merged.jsonl').write_text('kept\n', encoding='utf-8')
+    with pytest.raises(FileExistsError):
+        merge_results([shard], str(output))
+    assert (tmp_path / 'results_a_merged.jsonl').read_text(encoding='utf-8') == 'kept\n'
+
+    merge_results([shard], str(output), force=True)
+    assert [record['file'] for record in read_journal(tmp_path / 'results_a_merged.jsonl')] == ['o1.wav']
+
+
+def test_default_name_is_not_the_unsharded_journal():
+    assert merged_name(['runs/results_a_shard1of3.jsonl']) == 'results_a_merged'
+
+
+def test_batch_summary_counts_a_merged_folder_once(tmp_path):
+    from batch_summary import batch_summary
+    first = write_shard(tmp_path / 'results_a_shard1of2.jsonl', [('x1.wav', 'TP')])
+    second = write_shard(tmp_path / 'results_a_shard2of2.jsonl', [('x2.wav', 'FN')])
+    write_shard(tmp_path / 'results_b.jsonl', [('y1.wav', 'T')])
+    merge_results([first, second], str(tmp_path / merged_name([first, second])))
+
+    rows = {row['run']: row for row in batch_summary(str(tmp_path))}
+    assert set(rows) == {'a_merged', 'b', 'ALL'}
+    assert rows['ALL']['files'] == 3
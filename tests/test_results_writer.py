@@ -0,0 +1,19 @@
+from results_writer import ResultsWriter
+
+
+def test_failed_batch_is_retried_and_the_thread_survives():
+    batches = []
+
+    def write_records(records):
+        batches.append(list(records))
+        if len(batches) == 1:
+            raise ValueError('not an OSError')
+
+    writer = ResultsWriter(write_records)
+    writer.save([{'file': '1.wav'}])
+    assert writer.flush(5)
+    writer.save([{'file': '2.wav'}])
+    assert writer.flush(5)
+    writer.close(5)
+    assert batches == [[{'file': '1.wav'}], [{'file': '1.wav'}, {'file': '2.wav'}]]
+    assert not writer._thread.is_alive()
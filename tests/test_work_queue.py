@@ -0,0 +1,117 @@
+import asyncio
+import json
+import wave
+
+from work_queue import WorkQueue, WorkServer
+
+
+def test_each_clip_is_leased_once_in_order():
+    work = WorkQueue(3, done=[1], lease_s=10)
+    leases = [work.lease('alice', now=0), work.lease('bob', now=0)]
+    assert [index for _, index in leases] == [0, 2]
+    assert work.lease('alice', now=0) is None
+    assert work.status() == {'clips': 3, 'done': 1, 'pending': 0, 'leased': 2, 'failed': 0}
+
+
+def test_expired_lease_is_reclaimed_and_handed_out_first():
+    work = WorkQueue(3, lease_s=10)
+    expired, _ = work.lease('alice', now=0)
+    renewed, _ = work.lease('bob', now=0)
+    assert work.renew(renewed, now=8)
+    assert work.lease('carol', now=11)[1] == 0      # alice's clip, before the untouched clip 2
+    assert expired not in work.leases
+    assert not work.renew(expired, now=11)
+    assert renewed in work.leases
+
+
+def test_verdict_under_an_expired_lease_keeps_the_clip_out_of_the_queue():
+    work = WorkQueue(2, lease_s=10)
+    work.lease('alice', now=0)
+    work.reclaim(now=11)
+    work.complete(0)
+    assert work.lease('bob', now=11)[1] == 1
+    assert work.lease('bob', now=11) is None
+
+
+def test_released_clip_comes_next_and_failed_clip_never_again():
+    work = WorkQueue(3, lease_s=10)
+    first, _ = work.lease('alice', now=0)
+    broken, _ = work.lease('alice', now=0)
+    work.release(first)
+    work.fail(1)
+    work.release(broken)        # the server dropped it already, nothing comes back
+    assert [work.lease('bob', now=0)[1], work.lease('bob', now=0)[1]] == [0, 2]
+    assert work.lease('bob', now=0) is None
+    assert work.status()['failed'] == 1
+
+
+def write_wav(path, frames=800):
+    with wave.open(str(path), 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(8000)
+        audio.writeframes(b'\1\0' * frames)
+
+
+class FakeWriter:
+    def __init__(self):
+        self.data = b''
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def run_session(server, requests):
+    """feed requests to one connection, then hang up; returns the JSON replies
+    """
+    async def session():
+        reader = asyncio.StreamReader()
+        for request in requests:
+            reader.feed_data(json.dumps(request).encode('utf-8') + b'\n')
+        reader.feed_eof()
+        writer = FakeWriter()
+        await server.handle(reader, writer)
+        return writer.data
+    data = asyncio.run(session())
+    return [json.loads(line) for line in data.split(b'\n') if line.startswith(b'{')]
+
+
+def make_server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)     # the server's journal goes to the working directory
+    (tmp_path / 'audio').mkdir()
+    write_wav(tmp_path / 'audio' / 'c1.wav')
+    write_wav(tmp_path / 'audio' / 'c2.wav')
+    return WorkServer(str(tmp_path / 'audio'))
+
+
+def test_leases_of_a_closed_connection_go_back_to_the_queue(tmp_path, monkeypatch):
+    server = make_server(tmp_path, monkeypatch)
+    try:
+        replies = run_session(server, [{'op': 'hello', 'annotator': 'alice'}, {'op': 'lease'}])
+        assert replies[1]['file'] == 'c1.wav'
+        assert server.queue.status()['leased'] == 0
+        replies = run_session(server, [{'op': 'hello', 'annotator': 'bob'}, {'op': 'lease'}])
+        assert replies[1]['file'] == 'c1.wav'
+    finally:
+        server.writer.close()
+
+
+def test_clip_that_cannot_be_decoded_fails_alone(tmp_path, monkeypatch):
+    server = make_server(tmp_path, monkeypatch)
+    data = (tmp_path / 'audio' / 'c1.wav').read_bytes()
+    (tmp_path / 'audio' / 'c1.wav').write_bytes(data[:30])      # RIFF header, cut inside fmt
+    try:
+        replies = run_session(server, [{'op': 'hello', 'annotator': 'alice'}, {'op': 'lease'},
+                                       {'op': 'pcm', 'index': 0}, {'op': 'lease'}, {'op': 'pcm', 'index': 1}])
+        assert not replies[2]['ok'] and 'c1.wav' in replies[2]['error']
+        assert replies[3]['file'] == 'c2.wav'
+        assert replies[4]['ok'] and replies[4]['num_frames'] == 800
+        assert server.queue.status()['failed'] == 1
+    finally:
+        server.writer.close()
@@ -0,0 +1,92 @@
+import mmap
+import os
+from array import array
+
+
+class TextIndex:
+    """one-pass line index over a memory-mapped text file
+
+    Two layouts are supported, detected once from the first line:
+    - pattern1: a line ending with '.wav' starts a block, the lines up to the next '.wav' line are its text
+    - pattern2: one line of text per audio file
+    """
+    PATTERN_BLOCKS = 1
+    PATTERN_LINES = 2
+
+    def __init__(self, text_file, encoding='utf-8'):
+        self.text_file = text_file
+        self.encoding = encoding
+        self._file = open(text_file, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._size = size
+        # byte offset of the start of every line, plus one sentinel past the end
+        self._line_starts = array('Q', [0] if size else [])
+        position = self._map.find(b'\n')
+        while position != -1:
+            if position + 1 < size:
+                self._line_starts.append(position + 1)
+            position = self._map.find(b'\n', position + 1)
+        self.num_lines = len(self._line_starts)
+        self._line_starts.append(size)
+
+        self.pattern = self.PATTERN_LINES
+        self._block_starts = array('Q')     # line number of each '.wav' header
+        self._block_by_name = {}            # header filename -> block number
+        if self.num_lines and self._raw_line(0).endswith(b'.wav'):
+            self.pattern = self.PATTERN_BLOCKS
+            for line_number in range(self.num_lines):
+                header = self._raw_line(line_number)
+                if header.endswith(b'.wav'):
+                    name = os.path.basename(header.decode(encoding))
+                    self._block_by_name.setdefault(name, len(self._block_starts))
+                    self._block_starts.append(line_number)
+            self._block_starts.append(self.num_lines)
+
+    def __len__(self):
+        """number of texts: blocks for pattern1, lines for pattern2
+        """
+        if self.pattern == self.PATTERN_BLOCKS:
+            return len(self._block_starts) - 1
+        return self.num_lines
+
+    @property
+    def block_names(self):
+        """filenames of the '.wav' headers (pattern1), empty for pattern2
+        """
+        return self._block_by_name.keys()
+
+    def _raw_line(self, line_number):
+        return self._map[self._line_starts[line_number]:self._line_starts[line_number + 1]].strip()
+
+    def line(self, line_number):
+        return self._raw_line(line_number).decode(self.encoding)
+
+    def block_span(self, block_number):
+        """(first, last + 1) line numbers of the text of a block, the '.wav' header excluded
+        """
+        return self._block_starts[block_number] + 1, self._block_starts[block_number + 1]
+
+    def text_at(self, index):
+        """text of the index-th audio file, or None if out of range
+        """
+        if not 0 <= index < len(self):
+            return None
+        if self.pattern == self.PATTERN_LINES:
+            return self.line(index)
+        first, end = self.block_span(index)
+        lines = [self.line(line_number) for line_number in range(first, end)]
+        while lines and not lines[-1]:
+            lines.pop()
+        return '\n'.join(lines)
+
+    def text_for(self, filename):
+        """text block headed by filename (pattern1 only), or None
+        """
+        block_number = self._block_by_name.get(os.path.basename(filename))
+        return None if block_number is None else self.text_at(block_number)
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
@@ -0,0 +1,47 @@
+import hashlib
+import os
+
+from audio_archive import stat_audio
+from audio_signal import spectrogram_strip, waveform_peaks
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'evaluation_tool', 'thumbnails')
+THUMBNAIL_VERSION = 1   # bump when the rendering changes, old cache files are then ignored
+
+
+class ThumbnailCache:
+    """waveform peaks and spectrogram strips on disk, one .npz per file keyed by path, mtime and size
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, columns=800):
+        self.cache_dir = cache_dir
+        self.columns = columns
+
+    def _cache_path(self, file_path):
+        stat = stat_audio(file_path)
+        key = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.columns}|{THUMBNAIL_VERSION}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npz')
+
+    def get(self, file_path):
+        """{'low', 'high', 'spectrogram'} arrays, or None if not cached (or the file changed since)
+        """
+        import numpy as np
+        try:
+            with np.load(self._cache_path(file_path)) as data:
+                return {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+
+    def render(self, file_path, clip):
+        """cached thumbnail of file_path, computed from the decoded clip and stored on a miss
+        """
+        import numpy as np
+        thumbnail = self.get(file_path)
+        if thumbnail is None:
+            low, high = waveform_peaks(clip, self.columns)
+            thumbnail = {'low': low, 'high': high, 'spectrogram': spectrogram_strip(clip, self.columns)}
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cache_path = self._cache_path(file_path)
+            temp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+            np.savez(temp_path, **thumbnail)
+            os.replace(temp_path, cache_path)   # readers never see a half-written file
+        return thumbnail
@@ -0,0 +1,406 @@
+"""Share one audio folder among several annotators: a work-queue server and the client the GUI uses.
+
+    python work_queue.py --audio_folder audio_folder --text_file test.txt --listen 0.0.0.0:8765
+    python pyqt_evaluation_tool.py --server <host>:8765 --annotator alice
+
+The server hands out clips under leases that expire unless renewed or answered. It sends clip
+metadata, text and PCM data, and appends every verdict to the folder's journal and progress index.
+Requests and replies are JSON lines; PCM data follows its reply header as raw bytes.
+"""
+import asyncio
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import uuid
+import wave
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+from collections import deque
+
+from audio_archive import folder_name, is_archive
+from audio_cache import AudioCache, AudioClip
+from prescreen import clip_text
+from results_journal import VERDICTS
+
+
+DEFAULT_LEASE_S = 600
+REQUEST_TIMEOUT_S = 30
+
+
+def parse_address(address, default_host='127.0.0.1'):
+    """'host:port' or ':port' -> (host, port)
+    """
+    host, _, port = address.rpartition(':')
+    return host or default_host, int(port)
+
+
+class WorkQueue:
+    """clip indexes waiting for a verdict, and the leases of the ones handed out
+    """
+    def __init__(self, count, done=(), lease_s=DEFAULT_LEASE_S):
+        self.lease_s = lease_s
+        self.done = set(done)
+        self.failed = set()     # clips the server cannot decode, never handed out again
+        self.pending = deque(index for index in range(count) if index not in self.done)
+        self.leases = {}        # lease id -> (index, annotator, expires_at)
+
+    def lease(self, annotator, now=None):
+        """(lease id, index) of the next clip, None when nothing is left to hand out
+        """
+        now = time.monotonic() if now is None else now
+        self.reclaim(now)
+        while self.pending:
+            index = self.pending.popleft()
+            if index not in self.done and index not in self.failed:
+                lease_id = uuid.uuid4().hex
+                self.leases[lease_id] = (index, annotator, now + self.lease_s)
+                return lease_id, index
+        return None
+
+    def renew(self, lease_id, now=None):
+        if lease_id not in self.leases:
+            return False
+        index, annotator, _ = self.leases[lease_id]
+        self.leases[lease_id] = (index, annotator, (time.monotonic() if now is None else now) + self.lease_s)
+        return True
+
+    def release(self, lease_id):
+        """give a leased clip back, it is handed out next
+        """
+        lease = self.leases.pop(lease_id, None)
+        if lease is not None and lease[0] not in self.done:
+            self.pending.appendleft(lease[0])
+
+    def complete(self, index):
+        """a verdict arrived, under a lease or not (it may have expired meanwhile)
+        """
+        self.done.add(index)
+        for lease_id, lease in list(self.leases.items()):
+            if lease[0] == index:
+                del self.leases[lease_id]
+
+    def fail(self, index):
+        """the clip cannot be decoded: drop its leases and keep it out of the queue
+        """
+        self.failed.add(index)
+        for lease_id, lease in list(self.leases.items()):
+            if lease[0] == index:
+                del self.leases[lease_id]
+
+    def reclaim(self, now=None):
+        """put clips of expired leases back in front of the queue
+        """
+        now = time.monotonic() if now is None else now
+        for lease_id, (index, _, expires_at) in list(self.leases.items()):
+            if expires_at < now:
+                self.release(lease_id)
+
+    def status(self):
+        return {'clips': len(self.done) + len(self.pending) + len(self.leases) + len(self.failed),
+                'done': len(self.done), 'pending': len(self.pending), 'leased': len(self.leases),
+                'failed': len(self.failed)}
+
+
+class WorkServer:
+    """asyncio server of one audio folder, every connection is one annotator
+    """
+    def __init__(self, audio_folder, text_file=None, reference_audio_folder=None, lease_s=DEFAULT_LEASE_S,
+                 cache_mb=256):
+        from manifest import Manifest
+        from progress_index import ProgressIndex
+        from result_stats import ResultStats
+        from results_journal import ResultsJournal
+        from results_writer import ResultsWriter
+        from text_index import TextIndex
+
+        self.folder = folder_name(audio_folder)
+        self.text_index = TextIndex(text_file) if text_file else None
+        self.manifest = Manifest(audio_folder, self.text_index, reference_audio_folder)
+        self.journal = ResultsJournal.for_folder(audio_folder)
+        self.progress_index = ProgressIndex.for_folder(audio_folder, self.journal)
+        self.stats = ResultStats.from_verdicts(self.progress_index.verdicts)
+        done = [index for index, path in enumerate(self.manifest.audio_files)
+                if os.path.basename(path) in self.progress_index.verdicts]
+        self.queue = WorkQueue(len(self.manifest), done, lease_s)
+        self.cache = AudioCache(max_bytes=cache_mb * 1024 * 1024)
+        # verdicts of all annotators are group-committed by one writer thread
+        self.writer = ResultsWriter(self.write_records)
+
+    def write_records(self, records):
+        self.journal.append(records)
+        self.progress_index.append(records)
+
+    def lease_info(self, lease_id, index):
+        path = self.manifest.audio_files[index]
+        return {'ok': True, 'lease': lease_id, 'index': index, 'file': os.path.basename(path),
+                'text': clip_text(self.text_index, self.manifest, index),
+                'has_reference': bool(self.manifest.reference_files[index]), 'lease_s': self.queue.lease_s}
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        held = set()
+        annotator = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line)
+                op, data = request.get('op'), None
+                if op == 'hello':
+                    annotator = request.get('annotator') or 'anonymous'
+                    reply = {'ok': True, 'folder': self.folder, **self.queue.status()}
+                elif op == 'lease':
+                    lease = self.queue.lease(annotator)
+                    if lease is None:
+                        # not done while other annotators hold leases that may still come back
+                        reply = {'ok': False, 'done': not self.queue.leases}
+                    else:
+                        held.add(lease[0])
+                        reply = self.lease_info(*lease)
+                elif op == 'renew':
+                    reply = {'ok': self.queue.renew(request['lease'])}
+                elif op == 'release':
+                    self.queue.release(request['lease'])
+                    held.discard(request['lease'])
+                    reply = {'ok': True}
+                elif op == 'pcm':
+                    index = request['index']
+                    path = (self.manifest.reference_files if request.get('reference') else self.manifest.audio_files)[index]
+                    try:
+                        clip = await loop.run_in_executor(None, self.cache.load, path)
+                    except (OSError, EOFError, RuntimeError, ValueError, wave.Error) as e:
+                        # a broken clip fails alone, the connection and the rest of the queue go on
+                        print(f"Decoding '{os.path.basename(path)}' failed: {e!r}")
+                        if not request.get('reference'):
+                            self.queue.fail(index)
+                        reply = {'ok': False, 'error': f"cannot decode '{os.path.basename(path)}': {e!r}"}
+                    else:
+                        data = clip.data
+                        reply = {'ok': True, 'bytes': len(data), 'num_channels': clip.num_channels,
+                                 'bytes_per_sample': clip.bytes_per_sample, 'sample_rate': clip.sample_rate,
+                                 'num_frames': clip.num_frames}
+                elif op == 'verdicts':
+                    records = [record for record in request['records'] if record.get('result') in VERDICTS]
+                    for record in records:
+                        index = self.manifest.index_of(record['file'])
+                        if index is not None:
+                            self.queue.complete(index)
+                        self.stats.add(record)
+                    self.writer.save(records)
+                    # acknowledged once on disk, so the client can drop them
+                    await loop.run_in_executor(None, self.writer.flush)
+                    held.difference_update(request.get('leases', []))
+                    reply = {'ok': True, 'saved': len(records)}
+                elif op == 'status':
+                    reply = {'ok': True, **self.queue.status(), 'summary': self.stats.summary()}
+                else:
+                    reply = {'ok': False, 'error': f"unknown op '{op}'"}
+                writer.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+                if data is not None:
+                    writer.write(data)
+                await writer.drain()
+        except (ConnectionError, json.JSONDecodeError, KeyError, IndexError, OSError) as e:
+            print(f"Connection of {annotator or 'unknown annotator'} closed: {e}")
+        finally:
+            # a client that went away gives its clips back right away instead of at lease expiry
+            for lease_id in held:
+                self.queue.release(lease_id)
+            writer.close()
+
+    async def reclaim_expired(self, interval_s=5):
+        while True:
+            await asyncio.sleep(interval_s)
+            self.queue.reclaim()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        reclaimer = asyncio.create_task(self.reclaim_expired())
+        print(f"Serving {len(self.manifest)} clips ({self.queue.status()['pending']} to do) on {host}:{port}.")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            reclaimer.cancel()
+            self.writer.close()
+
+
+class WorkClient:
+    """blocking client of a WorkServer, safe to share between threads (requests are serialized)
+
+    Every socket operation times out after timeout_s, a server that stops answering raises instead of
+    blocking the caller; the connection is closed then, since the reply stream is out of step.
+    """
+    def __init__(self, address, annotator, timeout_s=REQUEST_TIMEOUT_S):
+        self.address = address
+        self.annotator = annotator
+        self._socket = socket.create_connection(parse_address(address), timeout=timeout_s)
+        self._file = self._socket.makefile('rwb')
+        self._lock = threading.Lock()
+        self.hello = self.request({'op': 'hello', 'annotator': annotator})
+
+    def request(self, message):
+        """send one request and return its reply, with 'data' holding the PCM bytes of a pcm reply
+        """
+        with self._lock:
+            try:
+                self._file.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+                self._file.flush()
+                line = self._file.readline()
+                if not line:
+                    raise ConnectionError(f"work server {self.address} closed the connection")
+                reply = json.loads(line)
+                if 'bytes' in reply:
+                    reply['data'] = self._file.read(reply['bytes'])
+            except socket.timeout:
+                self.close()
+                raise ConnectionError(f"work server {self.address} did not answer in time") from None
+        return reply
+
+    def clip(self, index, reference=False):
+        """the clip's PCM data, raises wave.Error if the server cannot decode it
+        """
+        reply = self.request({'op': 'pcm', 'index': index, 'reference': reference})
+        if not reply.get('ok'):
+            raise wave.Error(reply.get('error', 'the server cannot decode the clip'))
+        return AudioClip(reply['data'], reply['num_channels'], reply['bytes_per_sample'], reply['sample_rate'],
+                         reply['num_frames'])
+
+    def send_verdicts(self, records, leases=()):
+        return self.request({'op': 'verdicts', 'records': list(records), 'leases': list(leases)})
+
+    def close(self):
+        try:
+            self._file.close()
+        except OSError:
+            pass    # unflushed request of a broken connection
+        self._socket.close()
+
+
+class LeasePrefetcher:
+    """keeps the next lease, with its PCM data already downloaded, ready on a background thread
+
+    Leases taken but not yet answered are renewed until complete() or close(). on_ready is called on
+    the prefetch thread whenever a lease (or the end of the work) becomes available to next().
+    """
+    def __init__(self, client, ahead=1, on_ready=None):
+        self.client = client
+        self.on_ready = on_ready
+        self.done = False       # the server has no work left, or the connection failed
+        self._ready = queue.Queue(maxsize=ahead)
+        self._held = {}         # lease id -> renew interval in seconds
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._taken = threading.Event()     # wakes the thread to fetch a replacement right away
+        self._thread = threading.Thread(target=self._run, name='lease-prefetch', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        exhausted = False
+        last_renew = time.monotonic()
+        while not self._stopped.is_set():
+            try:
+                if not exhausted and not self._ready.full():
+                    lease = self.client.request({'op': 'lease'})
+                    if not lease.get('ok'):
+                        if lease.get('done'):
+                            exhausted = True
+                            self._put(None)
+                        else:
+                            self._stopped.wait(2)   # the rest is leased to others, ask again later
+                        continue
+                    try:
+                        lease['clip'] = self.client.clip(lease['index'])
+                    except wave.Error as e:
+                        print(f"Skipping '{lease['file']}': {e}")     # the server dropped its lease
+                        continue
+                    with self._lock:
+                        self._held[lease['lease']] = lease['lease_s'] / 3
+                    lease['reference_clip'] = None
+                    if lease['has_reference']:
+                        try:
+                            lease['reference_clip'] = self.client.clip(lease['index'], True)
+                        except wave.Error as e:
+                            print(f"No reference for '{lease['file']}': {e}")
+                    self._put(lease)
+                    continue
+                with self._lock:
+                    held = dict(self._held)
+                if held and time.monotonic() - last_renew > min(held.values()):
+                    for lease_id in held:
+                        self.client.request({'op': 'renew', 'lease': lease_id})
+                    last_renew = time.monotonic()
+            except (OSError, ValueError) as e:
+                print(f"Lease prefetch failed: {e}")
+                self._put(None)
+                return
+            self._taken.wait(0.2)
+            self._taken.clear()
+
+    def _put(self, lease):
+        self._ready.put(lease)
+        if self.on_ready is not None:
+            self.on_ready()
+
+    def next(self, timeout=None):
+        """the next lease dict (with 'clip' and 'reference_clip'), None if none came within timeout
+        (0 does not wait) or the server has no work left, which sets done
+        """
+        try:
+            lease = self._ready.get(timeout=timeout) if timeout != 0 else self._ready.get_nowait()
+        except queue.Empty:
+            return None
+        self._taken.set()
+        if lease is None:
+            self.done = True
+            self._ready.put(None)   # stay exhausted for later calls
+        return lease
+
+    def complete(self, lease_ids):
+        """stop renewing leases whose verdicts reached the server
+        """
+        with self._lock:
+            for lease_id in lease_ids:
+                self._held.pop(lease_id, None)
+
+    def close(self):
+        """stop prefetching and give back every lease without a verdict
+        """
+        self._stopped.set()
+        self._taken.set()
+        self._thread.join(5)
+        with self._lock:
+            held, self._held = list(self._held), {}
+        for lease_id in held:
+            try:
+                self.client.request({'op': 'release', 'lease': lease_id})
+            except OSError:
+                break   # the server releases them on disconnect anyway
+
+
+def main(argv=None):
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter, description=__doc__.splitlines()[0])
+    parser.add_argument('--audio_folder', type=str, required=True)
+    parser.add_argument('--text_file', type=str, default=None)
+    parser.add_argument('--reference_audio_folder', type=str, default=None)
+    parser.add_argument('--listen', type=str, default='127.0.0.1:8765', help='host:port, 0.0.0.0 to serve the LAN')
+    parser.add_argument('--lease_s', type=float, default=DEFAULT_LEASE_S, help='clips not answered in time go back to the queue')
+    parser.add_argument('--cache_mb', type=int, default=256)
+    args = parser.parse_args(argv)
+
+    if not (os.path.isdir(args.audio_folder) or is_archive(args.audio_folder)):
+        print(f"Audio folder '{args.audio_folder}' not found.")
+        return 1
+    server = WorkServer(args.audio_folder, args.text_file, args.reference_audio_folder, args.lease_s, args.cache_mb)
+    try:
+        asyncio.run(server.serve(*parse_address(args.listen)))
+    except KeyboardInterrupt:
+        print(f"Stopped, {server.queue.status()['done']} clips done.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())